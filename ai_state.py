@@ -40,9 +40,9 @@ class AIStateGather(entity_state.State):
     def execute(self, player):
         if self.time_since_last_update >= self.update_interval:
             # count current workers that is currently gathering
-            count = len(player.entities_where(lambda e: isinstance(e, entities.UnitWorker) and e.fsm.is_in_state(entity_state.StateGather)))
+            count = player.count_entities(entities.UnitWorker, state=entity_state.StateGather)
             # try to have x workers in gathering state at the same time (currently 10)
-            new_workers = player.entities_count_where(lambda e: isinstance(e, entities.UnitWorker) and e.is_idle, 20 - count)
+            new_workers = player.get_entities(entities.UnitWorker, 20 - count, idle=True)
             for worker in new_workers:
                 worker.fsm.change_state(entity_state.StateGather())
             # if count is less want wanted -> queue work
@@ -67,12 +67,10 @@ class AIStateExplore(entity_state.State):
     def execute(self, player):
         if self.time_since_last_update >= self.update_interval:
             # count current explorers
-            count = 0
-            for explorer in player.entities_where(lambda e: isinstance(e, entities.UnitExplorer)):
-                # if explorer is not currently exploring -> change its state
-                if explorer.is_idle:
-                    explorer.fsm.change_state(entity_state.StateExplore())
-                count += 1
+            count = player.count_entities(entities.UnitExplorer)
+            # if explorer is not currently exploring -> change its state
+            for explorer in player.get_entities(entities.UnitExplorer, idle=True):
+                explorer.fsm.change_state(entity_state.StateExplore())
             # try to have x amount of explorers units (currently 5)
             if count < 5:
                 player.prepend_goal(["Unit", "Explorer", 5])
@@ -1,4 +1,8 @@
+import array
 import collections
+import heapq
+import itertools
+import threading
 
 class Queue:
     def __init__(self):
@@ -27,25 +31,86 @@ class Stack:
         return self.elements.pop()
 
 class PriorityQueue:
+    REMOVED = object() # placeholder for stale heap entries
+
     def __init__(self):
-        self.elements = {}
+        self.elements = []          # heap of [priority, count, item]
+        self.entries = {}           # item -> live heap entry
+        self.counter = itertools.count()
 
     def empty(self):
-        return len(self.elements) == 0
+        return len(self.entries) == 0
 
     def put(self, item, priority):
-        self.elements[item] = priority
+        # decrease-key by lazy deletion, the old entry is marked as removed
+        entry = self.entries.get(item)
+        if entry is not None:
+            entry[-1] = PriorityQueue.REMOVED
+        entry = [priority, next(self.counter), item]
+        self.entries[item] = entry
+        heapq.heappush(self.elements, entry)
 
     def get(self):
-        best_item, best_priority = None, 99999 # "infinity"
-        for item, priority in self.elements.items():
-            # Searches for the item with best priority
-            if best_item is None or priority < best_priority:
-                best_item, best_priority = item, priority
-        
-        # Pop and return from queue
-        del self.elements[best_item]
-        return best_item
+        # pop until a live entry is found
+        while self.elements:
+            priority, count, item = heapq.heappop(self.elements)
+            if item is not PriorityQueue.REMOVED:
+                del self.entries[item]
+                return item
+        raise KeyError("get from an empty priority queue")
+
+    def __contains__(self, item):
+        return item in self.entries
+
+    def peek(self):
+        # best item and its priority without removing it
+        while self.elements and self.elements[0][-1] is PriorityQueue.REMOVED:
+            heapq.heappop(self.elements)
+        if not self.elements:
+            return None, None
+        return self.elements[0][2], self.elements[0][0]
+
+    def remove(self, item):
+        entry = self.entries.pop(item, None)
+        if entry is not None:
+            entry[-1] = PriorityQueue.REMOVED
+
+class LRUCache:
+    def __init__(self, capacity):
+        self.elements = collections.OrderedDict()
+        self.capacity = capacity
+        self.generation = 0     # bumped on invalidation so late results can be dropped
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key in self.elements:
+                self.hits += 1
+                self.elements.move_to_end(key)
+                return self.elements[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value, generation=None):
+        with self.lock:
+            # value was computed before the last invalidation
+            if generation is not None and generation != self.generation:
+                return
+            self.elements[key] = value
+            self.elements.move_to_end(key)
+            if len(self.elements) > self.capacity:
+                self.elements.popitem(last=False)
+
+    def remove_where(self, function):
+        with self.lock:
+            for key in [k for k in self.elements if function(k)]:
+                del self.elements[key]
+            self.generation += 1
+
+    def clear(self):
+        self.remove_where(lambda key: True)
 
 class WeightedGraph:
     def __init__(self, gamemap):
@@ -77,9 +142,10 @@ class WeightedGraph:
         # 8x movement
         current_neighbors = [(x+1, y), (x, y-1), (x-1, y), (x, y+1), (x+1, y+1), (x+1, y-1), (x-1, y+1), (x-1, y-1)]
 
+        # bounds first, passable and filter_func may index the map
+        current_neighbors = filter(self.in_bounds, current_neighbors)
         if filter_func:
             current_neighbors = filter(filter_func, current_neighbors)
-        current_neighbors = filter(self.in_bounds, current_neighbors)
         current_neighbors = filter(self.passable, current_neighbors)
         current_neighbors = filter(lambda neighbor: self.cutting_corner(current, neighbor), current_neighbors)
         return current_neighbors
@@ -93,13 +159,902 @@ class WeightedGraph:
         # If movement delta is 0 => movement is not diagonal
         return tile.movement_straight if (dx * dy == 0) else tile.movement_diagonal
 
+    def successors(self, current, filter_func):
+        # neighbors paired with the cost of moving to them
+        return [(neighbor, self.cost(current, neighbor)) for neighbor in self.neighbors(current, filter_func)]
+
+# Grid given as an int with one byte per cell (little endian), moved so byte i holds cell i + (dx, dy),
+# cells where that lies outside the grid get 0
+def ShiftedGrid(grid, width, height, dx, dy):
+    offset = dy * width + dx
+    if offset >= 0:
+        grid >>= 8 * offset
+    else:
+        grid = (grid << (-8 * offset)) & ((1 << (8 * width * height)) - 1)
+    if dx == 0:
+        return grid
+    row = b"\x01" * (width - 1) + b"\x00" if dx > 0 else b"\x00" + b"\x01" * (width - 1)
+    return grid & int.from_bytes(row * height, "little")
+
+class GridGraph(WeightedGraph):
+    # Same interface as WeightedGraph but reads flat arrays instead of tile sprites
+    # (arrays can be passed in, e.g. views of shared memory)
+    # 8x movement, successor_grid holds one byte per cell with bit n set when DIRECTIONS[n] can be taken
+    DIRECTIONS = ((1, 0), (0, -1), (-1, 0), (0, 1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+
+    def __init__(self, width, height, passable_grid=None, straight_grid=None, diagonal_grid=None, successor_grid=None):
+        self.width = width
+        self.height = height
+        size = width * height
+        self.passable_grid = passable_grid if passable_grid is not None else bytearray(size)
+        self.straight_grid = straight_grid if straight_grid is not None else array.array("i", [0]) * size
+        self.diagonal_grid = diagonal_grid if diagonal_grid is not None else array.array("i", [0]) * size
+        self.successor_grid = successor_grid if successor_grid is not None else bytearray(size)
+        self.successors_built = False
+        # successor byte -> ((dx, dy, index offset, diagonal), ...)
+        self.moves = [tuple((dx, dy, dy * width + dx, dx * dy != 0) for n, (dx, dy) in enumerate(GridGraph.DIRECTIONS) if bits >> n & 1)
+            for bits in range(256)]
+
+    def index(self, node):
+        return node[1] * self.width + node[0]
+
+    def set_tile(self, node, passable, movement_straight, movement_diagonal):
+        i = self.index(node)
+        self.passable_grid[i] = 1 if passable else 0
+        self.straight_grid[i] = movement_straight
+        self.diagonal_grid[i] = movement_diagonal
+        # changed tile affects its own and surrounding successors (corner rule)
+        if self.successors_built:
+            (x, y) = node
+            for nx in range(x - 1, x + 2):
+                for ny in range(y - 1, y + 2):
+                    if self.in_bounds((nx, ny)):
+                        self.successor_grid[self.index((nx, ny))] = self.build_successors((nx, ny))
+
+    def build_neighbors(self):
+        # every cell at once, a direction can be taken where the passable grid moved by it is set
+        (width, height) = (self.width, self.height)
+        passable = int.from_bytes(self.passable_grid, "little")
+        successors = 0
+        for n, (dx, dy) in enumerate(GridGraph.DIRECTIONS):
+            bits = ShiftedGrid(passable, width, height, dx, dy)
+            if dx * dy != 0:
+                bits &= ShiftedGrid(passable, width, height, dx, 0) & ShiftedGrid(passable, width, height, 0, dy)
+            successors |= bits << n
+        self.successor_grid[:] = successors.to_bytes(width * height, "little")
+        self.successors_built = True
+
+    def build_successors(self, current):
+        (x, y) = current
+        bits = 0
+        for n, (dx, dy) in enumerate(GridGraph.DIRECTIONS):
+            neighbor = (x + dx, y + dy)
+            if not self.in_bounds(neighbor) or not self.passable(neighbor):
+                continue
+            # diagonal movement may not cut the corner of a wall
+            if dx * dy != 0 and not (self.passable((x + dx, y)) and self.passable((x, y + dy))):
+                continue
+            bits |= 1 << n
+        return bits
+
+    def in_bounds(self, neighbor):
+        (x, y) = neighbor
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def passable(self, neighbor):
+        return self.passable_grid[neighbor[1] * self.width + neighbor[0]] == 1
+
+    def cost(self, from_node, to_node):
+        # movement from current to neighbor
+        dx = to_node[0] - from_node[0]
+        dy = to_node[1] - from_node[1]
+
+        i = to_node[1] * self.width + to_node[0]
+        # If movement delta is 0 => movement is not diagonal
+        return self.straight_grid[i] if (dx * dy == 0) else self.diagonal_grid[i]
+
+    def neighbors(self, current, filter_func):
+        return [neighbor for neighbor, cost in self.successors(current, filter_func)]
+
+    def successors(self, current, filter_func):
+        (x, y) = current
+        i = y * self.width + x
+        successors = []
+        for (dx, dy, offset, diagonal) in self.moves[self.successor_grid[i]]:
+            neighbor = (x + dx, y + dy)
+            if filter_func is None or filter_func(neighbor):
+                successors.append((neighbor, self.diagonal_grid[i + offset] if diagonal else self.straight_grid[i + offset]))
+        return successors
+
+class FlowField:
+    # Reverse Dijkstra from goal, maps every reached node to its next step towards goal
+    def __init__(self, graph, goal, filter_func=None):
+        self.graph = graph
+        self.goal = goal
+        self.filter_func = filter_func
+        self.rebuild()
+
+    def __contains__(self, node):
+        return node in self.next_step
+
+    def __getitem__(self, node):
+        return self.next_step[node]
+
+    def get_next_step(self, node):
+        return self.next_step.get(node, False)
+
+    def rebuild(self):
+        self.distances = {self.goal: 0}
+        self.next_step = {self.goal: None}
+        if self.graph.passable(self.goal):
+            self.expand([self.goal])
+
+    def update(self, nodes):
+        # new nodes can only shorten distances, so relax outwards from the reached nodes next to them
+        seeds = set()
+        for node in nodes:
+            for neighbor, step_cost in self.graph.successors(node, self.filter_func):
+                if neighbor in self.distances:
+                    seeds.add(neighbor)
+        self.expand(seeds)
+
+    def expand(self, nodes):
+        front = PriorityQueue()
+        for node in nodes:
+            front.put(node, self.distances[node])
+
+        while not front.empty():
+            current = front.get()
+            for neighbor, step_cost in self.graph.successors(current, self.filter_func):
+                new_cost = self.distances[current] + step_cost
+                if neighbor not in self.distances or new_cost < self.distances[neighbor]:
+                    self.distances[neighbor] = new_cost
+                    self.next_step[neighbor] = current
+                    front.put(neighbor, new_cost)
+
+class ConnectedComponents:
+    # Labels passable nodes by the region they belong to, nodes in different regions
+    # can never reach each other so those searches can be skipped
+    def __init__(self, graph, width, height):
+        self.graph = graph
+        self.width = width
+        self.height = height
+        self.labels = None  # node index -> region label, -1 for unpassable
+        self.members = None # label -> list of nodes
+        self.lock = threading.Lock()
+        self.relabel()
+
+    def __getitem__(self, node):
+        if self.dirty:
+            with self.lock:
+                if self.dirty:
+                    self.relabel()
+        return self.labels[node[1] * self.width + node[0]]
+
+    def connected(self, start, goal):
+        label = self[start]
+        return label != -1 and label == self[goal]
+
+    def component_of(self, node):
+        # every node reachable from node (including it), empty when node is unpassable
+        label = self[node]
+        return self.members[label] if label != -1 else ()
+
+    def relabel(self):
+        # built aside and swapped in, searches on other threads may be reading
+        width, graph = self.width, self.graph
+        labels = array.array("i", [-1]) * (width * self.height)
+        regions = []
+        for y in range(0, self.height):
+            for x in range(0, width):
+                if labels[y * width + x] != -1 or not graph.passable((x, y)):
+                    continue
+                # flood fill a new region
+                label = len(regions)
+                labels[y * width + x] = label
+                members = [(x, y)]
+                front = collections.deque(members)
+                while front:
+                    current = front.popleft()
+                    for neighbor, cost in graph.successors(current, None):
+                        i = neighbor[1] * width + neighbor[0]
+                        if labels[i] == -1:
+                            labels[i] = label
+                            members.append(neighbor)
+                            front.append(neighbor)
+                regions.append(members)
+        self.labels, self.members = labels, regions
+        self.dirty = False
+
+    def update(self, node, passable):
+        if self.dirty:
+            return
+        i = self.index_of(node)
+        if not passable:
+            # the region may have been split, label again when asked
+            if self.labels[i] != -1:
+                self.dirty = True
+            return
+        if self.labels[i] != -1:
+            return
+        # new passable tile, cheap when it touches at most one region
+        touching = set(self.labels[self.index_of(neighbor)] for neighbor, cost in self.graph.successors(node, None))
+        if len(touching) > 1:
+            self.dirty = True
+            return
+        label = touching.pop() if touching else len(self.members)
+        if label == len(self.members):
+            self.members.append([])
+        self.labels[i] = label
+        self.members[label].append(node)
+
+    def index_of(self, node):
+        return node[1] * self.width + node[0]
+
+class HierarchicalGraph:
+    # HPA*: the grid is split into clusters, entrances sit on the borders between clusters
+    # and the costs between entrances of a cluster are cached until the cluster changes
+    def __init__(self, graph, cluster_size=10, filter_func=None, min_cost=1, heuristic=None, node_budget=None):
+        self.graph = graph
+        self.heuristic = heuristic  # used when refining segments
+        self.node_budget = node_budget  # expansions before a search gives up
+        self.cluster_size = cluster_size
+        self.filter_func = filter_func
+        self.min_cost = min_cost    # cheapest straight step, keeps the heuristic admissible
+        self.clusters_width = (graph.width + cluster_size - 1) // cluster_size
+        self.clusters_height = (graph.height + cluster_size - 1) // cluster_size
+        self.border_entrances = {}  # (cluster, cluster) -> [(node, node), ...]
+        self.links = {}             # entrance -> {entrance in neighbouring cluster: cost}
+        self.intra_edges = {}       # cluster -> {entrance: {entrance: cost}}
+        self.dirty_borders = set()
+        self.dirty_clusters = set()
+        self.lock = threading.Lock()
+        self.mark_dirty_clusters([(cx, cy) for cx in range(0, self.clusters_width) for cy in range(0, self.clusters_height)])
+
+    def cluster_of(self, node):
+        return (node[0] // self.cluster_size, node[1] // self.cluster_size)
+
+    def walkable(self, node):
+        return self.graph.in_bounds(node) and self.graph.passable(node) and (self.filter_func is None or self.filter_func(node))
+
+    def mark_dirty(self, nodes):
+        # a changed node affects the corner rule of the nodes around it
+        clusters = set()
+        for (x, y) in nodes:
+            for nx in range(x - 1, x + 2):
+                for ny in range(y - 1, y + 2):
+                    if self.graph.in_bounds((nx, ny)):
+                        clusters.add(self.cluster_of((nx, ny)))
+        with self.lock:
+            self.mark_dirty_clusters(clusters)
+
+    def mark_dirty_clusters(self, clusters):
+        for (cx, cy) in clusters:
+            self.dirty_borders.update([((cx - 1, cy), (cx, cy)), ((cx, cy), (cx + 1, cy)), ((cx, cy - 1), (cx, cy)), ((cx, cy), (cx, cy + 1))])
+            # entrances of the neighbouring clusters may move as well
+            self.dirty_clusters.update([(cx, cy), (cx - 1, cy), (cx + 1, cy), (cx, cy - 1), (cx, cy + 1)])
+
+    def update_border(self, border):
+        (c1, c2) = border
+        # remove old links
+        for (a, b) in self.border_entrances.pop(border, []):
+            self.links[a].pop(b, None)
+            self.links[b].pop(a, None)
+        self.dirty_borders.discard(border)
+        if not (0 <= c1[0] and 0 <= c1[1] and c2[0] < self.clusters_width and c2[1] < self.clusters_height):
+            return
+
+        # pairs of nodes facing each other across the border
+        if c1[1] == c2[1]: # vertical border between horizontal neighbours
+            x = c2[0] * self.cluster_size
+            pairs = [((x - 1, y), (x, y)) for y in range(c1[1] * self.cluster_size, min((c1[1] + 1) * self.cluster_size, self.graph.height))]
+        else: # horizontal border between vertical neighbours
+            y = c2[1] * self.cluster_size
+            pairs = [((x, y - 1), (x, y)) for x in range(c1[0] * self.cluster_size, min((c1[0] + 1) * self.cluster_size, self.graph.width))]
+
+        # each run of open pairs gets an entrance in the middle, long runs one at each end
+        entrances = []
+        run = []
+        for pair in pairs + [None]:
+            if pair and self.walkable(pair[0]) and self.walkable(pair[1]):
+                run.append(pair)
+                continue
+            if len(run) >= 6:
+                entrances += [run[0], run[-1]]
+            elif run:
+                entrances.append(run[len(run) // 2])
+            run = []
+
+        for (a, b) in entrances:
+            self.links.setdefault(a, {})[b] = self.graph.cost(a, b)
+            self.links.setdefault(b, {})[a] = self.graph.cost(b, a)
+        self.border_entrances[border] = entrances
+
+    def entrances(self, cluster):
+        (cx, cy) = cluster
+        entrances = []
+        for border in (((cx - 1, cy), (cx, cy)), ((cx, cy), (cx + 1, cy)), ((cx, cy - 1), (cx, cy)), ((cx, cy), (cx, cy + 1))):
+            if border in self.dirty_borders:
+                self.update_border(border)
+            for pair in self.border_entrances.get(border, []):
+                entrances += [node for node in pair if self.cluster_of(node) == cluster]
+        return entrances
+
+    def cluster_edges(self, cluster):
+        if cluster in self.dirty_clusters or cluster not in self.intra_edges:
+            self.dirty_clusters.discard(cluster)
+            entrances = self.entrances(cluster)
+            edges = {}
+            for entrance in entrances:
+                costs = self.cluster_search(entrance, cluster)
+                edges[entrance] = {other: costs[other] for other in entrances if other != entrance and other in costs}
+            self.intra_edges[cluster] = edges
+        return self.intra_edges[cluster]
+
+    def cluster_search(self, source, cluster, walking=False):
+        # Dijkstra that stays inside cluster, walking=True gives the cost of walking from source instead of to it
+        costs = {source: 0}
+        front = PriorityQueue()
+        front.put(source, 0)
+        while not front.empty():
+            current = front.get()
+            for neighbor, step_cost in self.graph.successors(current, self.filter_func):
+                if self.cluster_of(neighbor) != cluster:
+                    continue
+                if walking:
+                    step_cost = self.graph.cost(neighbor, current)
+                new_cost = costs[current] + step_cost
+                if neighbor not in costs or new_cost < costs[neighbor]:
+                    costs[neighbor] = new_cost
+                    front.put(neighbor, new_cost)
+        return costs
+
+    def get_path(self, start, goal):
+        if not self.graph.passable(start) or not self.graph.passable(goal):
+            return False
+        if start == goal:
+            return {start: None}
+
+        with self.lock:
+            # connect goal and start to the entrances of their clusters
+            start_cluster, goal_cluster = self.cluster_of(start), self.cluster_of(goal)
+            from_goal = self.cluster_search(goal, goal_cluster)
+            to_start = self.cluster_search(start, start_cluster, walking=True)
+            goal_entrances = self.entrances(goal_cluster)
+
+            # abstract search from goal to start, same direction as Astar
+            front = PriorityQueue()
+            front.put(goal, 0)
+            path = {goal: None}
+            travel_costs = {goal: 0}
+            expanded = 0
+
+            while not front.empty():
+                # out of budget, gave up
+                if self.node_budget and expanded >= self.node_budget:
+                    return None
+                current = front.get()
+                expanded += 1
+                if current == start:
+                    break
+
+                successors = []
+                if current == goal:
+                    successors += [(entrance, from_goal[entrance]) for entrance in goal_entrances if entrance in from_goal]
+                    if start in from_goal:
+                        successors.append((start, from_goal[start]))
+                cluster = self.cluster_of(current)
+                successors += self.cluster_edges(cluster).get(current, {}).items()
+                successors += self.links.get(current, {}).items()
+                if cluster == start_cluster and current in to_start:
+                    successors.append((start, to_start[current]))
+
+                for neighbor, step_cost in successors:
+                    new_cost = travel_costs[current] + step_cost
+                    if neighbor not in travel_costs or new_cost < travel_costs[neighbor]:
+                        travel_costs[neighbor] = new_cost
+                        distance = max(abs(neighbor[0] - start[0]), abs(neighbor[1] - start[1]))
+                        front.put(neighbor, new_cost + self.min_cost * distance)
+                        path[neighbor] = current
+
+        if start not in path:
+            return False
+        # waypoints in walking order, each unit walks them with its own HierarchicalPath
+        waypoints = [start]
+        while path[waypoints[-1]] is not None:
+            waypoints.append(path[waypoints[-1]])
+        return waypoints
+
+    def refine(self, start, goal):
+        # neighbours across a border, links change while other threads search
+        with self.lock:
+            linked = goal in self.links.get(start, {})
+        if linked:
+            return {start: goal, goal: None}
+        cluster = self.cluster_of(start)
+        filter_func = lambda node: self.cluster_of(node) == cluster and (self.filter_func is None or self.filter_func(node))
+        return Astar(self.graph, goal, start, filter_func, self.heuristic)
+
+class HierarchicalPath:
+    # Abstract path that is refined one segment at a time as the unit walks it, used like an Astar path
+    # it keeps the walking unit's progress, so every unit needs its own
+    def __init__(self, hierarchical_graph, waypoints):
+        self.hierarchical_graph = hierarchical_graph
+        self.waypoints = waypoints
+        self.segment = 0
+        self.next_step = {}
+        if len(waypoints) == 1:
+            self.next_step[waypoints[0]] = None
+        else:
+            self.refine()
+
+    def __contains__(self, node):
+        return node in self.next_step
+
+    def __getitem__(self, node):
+        # reached the end of the refined part
+        if self.segment < len(self.waypoints) - 1 and node == self.waypoints[self.segment]:
+            self.refine()
+        return self.next_step[node]
+
+    def refine(self):
+        start = self.waypoints[self.segment]
+        goal = self.waypoints[self.segment + 1]
+        trace = self.hierarchical_graph.refine(start, goal)
+        if not trace:
+            # cluster changed since the abstract search, search the rest of the way
+            graph = self.hierarchical_graph
+            trace = Astar(graph.graph, self.waypoints[-1], start, graph.filter_func, graph.heuristic, None, graph.node_budget) or {start: None}
+            self.segment = len(self.waypoints) - 1
+            self.next_step.update(trace)
+            return
+        self.segment += 1
+        self.next_step.update(trace)
+        # next segment is refined once the unit gets there
+        if self.segment < len(self.waypoints) - 1:
+            del self.next_step[goal]
+
+class DStarLite:
+    # Incremental search for a unit walking into unknown terrain. Undiscovered tiles are assumed
+    # passable at the cheapest movement cost, and only the affected part of the search is repaired
+    # when the map reports changed tiles. Used like an Astar path: planner[location] -> next step
+    # the first plan is made by step(), a slice at a time like AstarSearch
+    INFINITY = float("inf")
+
+    def __init__(self, graph, start, goal, known_func=None, min_cost=(10, 14), node_budget=None):
+        self.graph = graph
+        self.node_budget = node_budget  # expansions allowed per (re)planning, a planner over budget gives up
+        self.failed = False
+        self.expanded = 0
+        self.planned = 0    # expansions in the current (re)planning
+        self.result = None
+        self.start = start
+        self.last = start
+        self.goal = goal
+        self.known_func = known_func
+        self.min_cost = min_cost
+        self.km = 0
+        self.g = {}
+        self.rhs = {goal: 0}
+        self.changed = set()
+        self.front = PriorityQueue()
+        self.front.put(goal, self.calculate_key(goal))
+
+    def __contains__(self, node):
+        return not self.failed and self.g.get(node, DStarLite.INFINITY) < DStarLite.INFINITY
+
+    def __getitem__(self, node):
+        # the unit is standing on node and asks for its next step
+        if node == self.goal or self.failed:
+            return None
+        self.start = node
+        if self.changed:
+            self.repair()
+        return None if self.failed else self.next_step(node)
+
+    def notify_changed(self, nodes):
+        self.changed.update(nodes)
+
+    def heuristic(self, from_node, to_node):
+        return HeuristicOctile(from_node, to_node, self.min_cost[0], self.min_cost[1])
+
+    def known(self, node):
+        return self.known_func is None or self.known_func(node)
+
+    def walkable(self, node):
+        return self.graph.in_bounds(node) and (not self.known(node) or self.graph.passable(node))
+
+    def cost(self, from_node, to_node):
+        # walking cost depends on the tile that is left
+        if self.known(from_node):
+            return self.graph.cost(to_node, from_node)
+        dx, dy = to_node[0] - from_node[0], to_node[1] - from_node[1]
+        return self.min_cost[0] if dx * dy == 0 else self.min_cost[1]
+
+    def neighbors(self, node):
+        (x, y) = node
+        result = []
+        for (dx, dy) in ((1, 0), (0, -1), (-1, 0), (0, 1), (1, 1), (1, -1), (-1, 1), (-1, -1)):
+            neighbor = (x + dx, y + dy)
+            if not self.walkable(neighbor):
+                continue
+            # diagonal movement may not cut the corner of a wall
+            if dx * dy != 0 and not (self.walkable((x + dx, y)) and self.walkable((x, y + dy))):
+                continue
+            result.append(neighbor)
+        return result
+
+    def calculate_key(self, node):
+        best = min(self.g.get(node, DStarLite.INFINITY), self.rhs.get(node, DStarLite.INFINITY))
+        return (best + self.heuristic(self.start, node) + self.km, best)
+
+    def update_vertex(self, node):
+        if node != self.goal:
+            best = DStarLite.INFINITY
+            if self.walkable(node):
+                for neighbor in self.neighbors(node):
+                    best = min(best, self.cost(node, neighbor) + self.g.get(neighbor, DStarLite.INFINITY))
+            self.rhs[node] = best
+        self.front.remove(node)
+        if self.g.get(node, DStarLite.INFINITY) != self.rhs.get(node, DStarLite.INFINITY):
+            self.front.put(node, self.calculate_key(node))
+
+    # returns False when max_nodes ran out before the plan was done, call again to go on
+    def compute_shortest_path(self, max_nodes=None):
+        while True:
+            current, old_key = self.front.peek()
+            if current is None:
+                break
+            start_consistent = self.rhs.get(self.start, DStarLite.INFINITY) == self.g.get(self.start, DStarLite.INFINITY)
+            if not old_key < self.calculate_key(self.start) and start_consistent:
+                break
+            if max_nodes is not None:
+                if max_nodes <= 0:
+                    return False
+                max_nodes -= 1
+            self.expanded += 1
+            self.planned += 1
+            if self.node_budget and self.planned > self.node_budget:
+                self.failed = True
+                break
+            self.front.get()
+            new_key = self.calculate_key(current)
+            g, rhs = self.g.get(current, DStarLite.INFINITY), self.rhs.get(current, DStarLite.INFINITY)
+            if old_key < new_key:
+                self.front.put(current, new_key)
+            elif g > rhs:
+                self.g[current] = rhs
+                for neighbor in self.neighbors(current):
+                    self.update_vertex(neighbor)
+            else:
+                self.g[current] = DStarLite.INFINITY
+                for neighbor in self.neighbors(current) + [current]:
+                    self.update_vertex(neighbor)
+        self.planned = 0
+        return True
+
+    # returns True once the first plan is done, result is then the planner itself,
+    # False when the goal can't be reached or None when the planner gave up
+    def step(self, max_nodes=None):
+        if not self.compute_shortest_path(max_nodes):
+            return False
+        if self.failed:
+            self.result = None
+        else:
+            self.result = self if self.start in self else False
+        return True
+
+    def repair(self):
+        self.km += self.heuristic(self.last, self.start)
+        self.last = self.start
+        # a changed tile changes the edges (and corner rule) of the tiles around it
+        nodes = set()
+        for (x, y) in self.changed:
+            for nx in range(x - 1, x + 2):
+                for ny in range(y - 1, y + 2):
+                    if self.graph.in_bounds((nx, ny)):
+                        nodes.add((nx, ny))
+        self.changed.clear()
+        for node in nodes:
+            self.update_vertex(node)
+        self.compute_shortest_path()
+
+    def next_step(self, node):
+        best, best_cost = None, DStarLite.INFINITY
+        for neighbor in self.neighbors(node):
+            cost = self.cost(node, neighbor) + self.g.get(neighbor, DStarLite.INFINITY)
+            if cost < best_cost:
+                best, best_cost = neighbor, cost
+        return best
+
+class SpatialIndex:
+    # Nodes bucketed in a uniform grid, nearest queries only visit buckets in rings
+    # around the origin until no closer node can be left
+    def __init__(self, bucket_size=8):
+        self.bucket_size = bucket_size
+        self.buckets = {}   # (bucket x, bucket y) -> set of nodes
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, node):
+        return node in self.buckets.get(self.bucket_of(node), ())
+
+    def bucket_of(self, node):
+        return (node[0] // self.bucket_size, node[1] // self.bucket_size)
+
+    def add(self, node):
+        bucket = self.buckets.setdefault(self.bucket_of(node), set())
+        if node not in bucket:
+            bucket.add(node)
+            self.count += 1
+
+    def remove(self, node):
+        key = self.bucket_of(node)
+        bucket = self.buckets.get(key)
+        if bucket and node in bucket:
+            bucket.remove(node)
+            self.count -= 1
+            if not bucket:
+                del self.buckets[key]
+
+    def ring(self, center, radius):
+        (bx, by) = center
+        if radius == 0:
+            return [center]
+        ring = []
+        for x in range(bx - radius, bx + radius + 1):
+            ring.append((x, by - radius))
+            ring.append((x, by + radius))
+        for y in range(by - radius + 1, by + radius):
+            ring.append((bx - radius, y))
+            ring.append((bx + radius, y))
+        return ring
+
+    # k nodes closest to origin (straight line), nodes failing valid_func are dropped on the way
+    # and nodes failing filter_func are skipped but kept
+    def nearest(self, origin, k=1, valid_func=None, filter_func=None):
+        (ox, oy) = origin
+        center = self.bucket_of(origin)
+        found = []  # (squared distance, node)
+        seen = 0
+        radius = 0
+        while seen < self.count:
+            for key in self.ring(center, radius):
+                for node in list(self.buckets.get(key, ())):
+                    if valid_func and not valid_func(node):
+                        self.remove(node)
+                        continue
+                    seen += 1
+                    if filter_func and not filter_func(node):
+                        continue
+                    found.append(((node[0] - ox) ** 2 + (node[1] - oy) ** 2, node))
+            # nodes in the next ring are at least this far away
+            reach = radius * self.bucket_size + 1
+            if len(found) >= k:
+                found.sort()
+                if found[k - 1][0] <= reach * reach:
+                    break
+            radius += 1
+        found.sort()
+        return [node for distance, node in found[:k]]
+
+class SearchStats:
+    # Node counts summed over searches, for tuning heuristics
+    def __init__(self):
+        self.searches = 0
+        self.expanded = 0
+        self.generated = 0
+        self.lock = threading.Lock()
+
+    def add(self, expanded, generated):
+        with self.lock:
+            self.searches += 1
+            self.expanded += expanded
+            self.generated += generated
+
 # Manhattan distance heuristic
 def HeuristicManhattar(from_node, to_node):
     (x1, y1) = from_node
     (x2, y2) = to_node
     return abs(x2 - x1) + abs(y2 - y1)
 
-def Astar(graph, start, goal, filter_func=None):
+# Chebyshev distance heuristic (diagonal steps as cheap as straight ones)
+def HeuristicChebyshev(from_node, to_node):
+    (x1, y1) = from_node
+    (x2, y2) = to_node
+    return max(abs(x2 - x1), abs(y2 - y1))
+
+# Octile distance heuristic, exact on open terrain with the given step costs
+def HeuristicOctile(from_node, to_node, straight=1, diagonal=1):
+    dx = abs(to_node[0] - from_node[0])
+    dy = abs(to_node[1] - from_node[1])
+    return straight * abs(dx - dy) + diagonal * min(dx, dy)
+
+# Heuristic scaled by the cheapest step costs, epsilon > 1 trades optimality for speed
+def MakeHeuristic(name="octile", straight=1, diagonal=1, epsilon=1.0):
+    if name == "manhattan":
+        heuristic = lambda from_node, to_node: straight * HeuristicManhattar(from_node, to_node)
+    elif name == "chebyshev":
+        heuristic = lambda from_node, to_node: straight * HeuristicChebyshev(from_node, to_node)
+    elif name == "octile":
+        heuristic = lambda from_node, to_node: HeuristicOctile(from_node, to_node, straight, diagonal)
+    else:
+        raise ValueError("unknown heuristic: " + str(name))
+    if epsilon == 1:
+        return heuristic
+    return lambda from_node, to_node: epsilon * heuristic(from_node, to_node)
+
+class AstarSearch:
+    # Astar that can be resumed, step() expands at most max_nodes nodes per call and
+    # node_budget caps the whole search. result is the path, False when there is none
+    # and None when the search gave up, which says nothing about the goal being reachable
+    def __init__(self, graph, start, goal, filter_func=None, heuristic=None, stats=None, node_budget=None):
+        if heuristic is None:
+            heuristic = lambda from_node, to_node: 10 * HeuristicManhattar(from_node, to_node)
+        self.graph = graph
+        self.start = start
+        self.goal = goal
+        self.filter_func = filter_func
+        self.heuristic = heuristic
+        self.stats = stats
+        self.node_budget = node_budget
+        self.front = PriorityQueue()
+        self.path = {start: None}
+        self.travel_costs = {start: 0}
+        self.expanded = 0
+        self.generated = 0
+        # partial progress
+        self.closest = start
+        self.closest_estimate = heuristic(start, goal)
+        self.done = False
+        self.result = None
+
+        if not graph.passable(start) or not graph.passable(goal):
+            self.finish(False)
+        elif start == goal:
+            self.finish({start : None})
+        else:
+            self.front.put(start, (self.closest_estimate, self.closest_estimate))
+
+    def finish(self, result):
+        self.done = True
+        self.result = result
+        if self.stats:
+            self.stats.add(self.expanded, self.generated)
+
+    def get_progress(self):
+        return {"expanded": self.expanded, "closest": self.closest, "estimate": self.closest_estimate, "done": self.done}
+
+    def step(self, max_nodes=None):
+        # returns True once the search is done, the path (or False) is then in result
+        goal, path, travel_costs, front = self.goal, self.path, self.travel_costs, self.front
+        while not self.done:
+            if max_nodes is not None:
+                if max_nodes <= 0:
+                    break
+                max_nodes -= 1
+
+            # nothing left to search
+            if front.empty():
+                self.finish(False)
+                break
+            # out of budget, gave up
+            if self.node_budget and self.expanded >= self.node_budget:
+                self.finish(None)
+                break
+
+            # Get the current best option
+            current = front.get()
+            self.expanded += 1
+
+            # Goal found
+            if (current == goal):
+                self.finish(self.reconstruct())
+                break
+
+            # Check cost of each neighbor next to current
+            for neighbor, step_cost in self.graph.successors(current, self.filter_func):
+                # new cost is equal to current travel cost + cost to travel to next neighbor
+                new_cost = travel_costs[current] + step_cost
+                # If travel cost to neighbor hasn't already been evaluated, or is lower than previous evaluated travel cost, update the travel cost
+                if neighbor not in travel_costs or new_cost < travel_costs[neighbor]:
+                    travel_costs[neighbor] = new_cost
+
+                    estimate = self.heuristic(neighbor, goal)
+                    # equal priorities go to the node closest to the goal, then first come first served
+                    front.put(neighbor, (new_cost + estimate, estimate))
+                    self.generated += 1
+                    path[neighbor] = current
+                    if estimate < self.closest_estimate:
+                        self.closest, self.closest_estimate = neighbor, estimate
+        return self.done
+
+    def reconstruct(self):
+        current = self.goal
+        trace = {}
+        while current != self.start:
+            trace[current] = self.path.get(current, False)
+            if not trace[current]:
+                return False
+            current = self.path[current]
+        trace[self.start] = None
+        return trace
+
+def Astar(graph, start, goal, filter_func=None, heuristic=None, stats=None, node_budget=None):
+    search = AstarSearch(graph, start, goal, filter_func, heuristic, stats, node_budget)
+    search.step()
+    return search.result
+
+# Dijkstra from start that stops at the first reached node in goals, returns (goal, path)
+# path is None when the search ran out of node_budget
+def DijkstraNearest(graph, start, goals, filter_func=None, node_budget=None):
+
+    if not graph.passable(start):
+        return None, False
+
+    front = PriorityQueue()
+    front.put(start, 0)
+    path = {}
+    travel_costs = {}
+    path[start] = None
+    travel_costs[start] = 0
+    expanded = 0
+
+    while not front.empty():
+        # out of budget, gave up
+        if node_budget and expanded >= node_budget:
+            return None, None
+        current = front.get()
+        expanded += 1
+
+        # Closest goal found
+        if current in goals:
+            # reconstruct path, each node points to the next one towards the goal
+            trace = {current: None}
+            while path[current] is not None:
+                trace[path[current]] = current
+                current = path[current]
+            return next(iter(trace)), trace
+
+        for neighbor, step_cost in graph.successors(current, filter_func):
+            # walking from current to neighbor costs what leaving current costs
+            new_cost = travel_costs[current] + graph.cost(neighbor, current)
+            if neighbor not in travel_costs or new_cost < travel_costs[neighbor]:
+                travel_costs[neighbor] = new_cost
+                front.put(neighbor, new_cost)
+                path[neighbor] = current
+
+    return None, False
+
+
+# Cells of a GridGraph that touch passable terrain with another movement cost than uniform_cost
+def BoundaryMask(graph, uniform_cost):
+    (straight, diagonal) = uniform_cost
+    (width, height) = (graph.width, graph.height)
+    other_cost = int.from_bytes(bytes(1 if passable and (s != straight or d != diagonal) else 0
+        for passable, s, d in zip(graph.passable_grid, graph.straight_grid, graph.diagonal_grid)), "little")
+    mask = 0
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            mask |= ShiftedGrid(other_cost, width, height, dx, dy)
+    return bytearray(mask.to_bytes(width * height, "little"))
+
+# Refresh the mask around changed nodes instead of building it again
+def UpdateBoundaryMask(mask, graph, uniform_cost, nodes):
+    (straight, diagonal) = uniform_cost
+    def other_cost(i):
+        return graph.passable_grid[i] and (graph.straight_grid[i] != straight or graph.diagonal_grid[i] != diagonal)
+    for (x, y) in nodes:
+        for nx in range(max(x - 1, 0), min(x + 2, graph.width)):
+            for ny in range(max(y - 1, 0), min(y + 2, graph.height)):
+                mask[ny * graph.width + nx] = 1 if any(other_cost(j * graph.width + i)
+                    for i in range(max(nx - 1, 0), min(nx + 2, graph.width)) for j in range(max(ny - 1, 0), min(ny + 2, graph.height))) else 0
+
+# Jump point search (no corner cutting) over cells that cost uniform_cost to enter,
+# nodes next to other terrain costs are expanded like in Astar, returns None when node_budget ran out
+def JumpPointSearch(graph, start, goal, filter_func=None, uniform_cost=(10, 14), boundary_mask=None, stats=None, node_budget=None):
 
     if not graph.passable(start) or not graph.passable(goal):
         return False
@@ -108,41 +1063,154 @@ def Astar(graph, start, goal, filter_func=None):
         path = {start : None}
         return path
 
+    (straight, diagonal) = uniform_cost
+    walkable_nodes = {}
+    boundary_nodes = {}
+
+    def walkable(node):
+        result = walkable_nodes.get(node)
+        if result is None:
+            result = graph.in_bounds(node) and graph.passable(node) and (filter_func is None or filter_func(node))
+            walkable_nodes[node] = result
+        return result
+
+    def passable(node):
+        # corners only need passable terrain, filter_func decides which tiles can be entered
+        return graph.in_bounds(node) and graph.passable(node)
+
+    def uniform(node):
+        (x, y) = node
+        return graph.cost((x - 1, y), node) == straight and graph.cost((x - 1, y - 1), node) == diagonal
+
+    def boundary(node):
+        if boundary_mask is not None and filter_func is None:
+            return boundary_mask[node[1] * graph.width + node[0]] == 1
+        result = boundary_nodes.get(node)
+        if result is None:
+            (x, y) = node
+            around = [(nx, ny) for nx in range(x - 1, x + 2) for ny in range(y - 1, y + 2)]
+            if boundary_mask is not None:
+                result = boundary_mask[y * graph.width + x] == 1
+            else:
+                # node touches a walkable tile with another movement cost
+                result = any(walkable(n) and not uniform(n) for n in around)
+            # or a passable tile the filter hides, diagonals can cut its corner which the jump rules don't expect
+            if not result and filter_func is not None:
+                result = any(passable(n) and not walkable(n) for n in around)
+            boundary_nodes[node] = result
+        return result
+
+    def jump(node, dx, dy):
+        (x, y) = node
+        while True:
+            if not walkable((x + dx, y + dy)):
+                return None
+            # diagonal movement may not cut the corner of a wall
+            if dx * dy != 0 and not (passable((x + dx, y)) and passable((x, y + dy))):
+                return None
+            x, y = x + dx, y + dy
+            if (x, y) == goal or boundary((x, y)):
+                return (x, y)
+            if dx * dy != 0:
+                # diagonal jumps stop where a straight jump finds something
+                if jump((x, y), dx, 0) or jump((x, y), 0, dy):
+                    return (x, y)
+            elif dx != 0:
+                if (walkable((x, y - 1)) and not walkable((x - dx, y - 1))) or (walkable((x, y + 1)) and not walkable((x - dx, y + 1))):
+                    return (x, y)
+            else:
+                if (walkable((x - 1, y)) and not walkable((x - 1, y - dy))) or (walkable((x + 1, y)) and not walkable((x + 1, y - dy))):
+                    return (x, y)
+
+    def directions(node, parent):
+        (x, y) = node
+        dx = (x > parent[0]) - (x < parent[0])
+        dy = (y > parent[1]) - (y < parent[1])
+        result = []
+        if dx != 0 and dy != 0:
+            if walkable((x, y + dy)):
+                result.append((0, dy))
+            if walkable((x + dx, y)):
+                result.append((dx, 0))
+            if passable((x, y + dy)) and passable((x + dx, y)):
+                result.append((dx, dy))
+        else:
+            # (sx, sy) is the side axis of the straight movement
+            sx, sy = abs(dy), abs(dx)
+            if walkable((x + dx, y + dy)):
+                result.append((dx, dy))
+                for side in (1, -1):
+                    if walkable((x + sx * side, y + sy * side)):
+                        result.append((dx + sx * side, dy + sy * side))
+            for side in (1, -1):
+                if walkable((x + sx * side, y + sy * side)):
+                    result.append((sx * side, sy * side))
+        return result
+
+    def successors(current):
+        parent = path[current]
+        # next to other terrain costs -> plain weighted Astar expansion
+        if boundary(current):
+            return graph.successors(current, filter_func)
+        if parent is None:
+            moves = ((1, 0), (0, -1), (-1, 0), (0, 1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+        else:
+            moves = directions(current, parent)
+        result = []
+        for (dx, dy) in moves:
+            jump_point = jump(current, dx, dy)
+            if jump_point:
+                steps = max(abs(jump_point[0] - current[0]), abs(jump_point[1] - current[1]))
+                # every step but the last one is on uniform terrain
+                step_cost = straight if dx * dy == 0 else diagonal
+                result.append((jump_point, (steps - 1) * step_cost + graph.cost((jump_point[0] - dx, jump_point[1] - dy), jump_point)))
+        return result
+
     front = PriorityQueue()
     front.put(start, 0)
     path = {}
     travel_costs = {}
     path[start] = None
     travel_costs[start] = 0
+    expanded = generated = 0
 
     while not front.empty():
-        # Get the current best option
+        # out of budget, gave up
+        if node_budget and expanded >= node_budget:
+            if stats:
+                stats.add(expanded, generated)
+            return None
         current = front.get()
+        expanded += 1
 
-        # Goal found
         if (current == goal):
             break
 
-        # Check cost of each neighbor next to current
-        for neighbor in graph.neighbors(current, filter_func):
-            # new cost is equal to current travel cost + cost to travel to next neighbor
-            new_cost = travel_costs[current] + graph.cost(current, neighbor)
-            # If travel cost to neighbor hasn't already been evaluated, or is lower than previous evaluated travel cost, update the travel cost
+        for neighbor, step_cost in successors(current):
+            new_cost = travel_costs[current] + step_cost
             if neighbor not in travel_costs or new_cost < travel_costs[neighbor]:
                 travel_costs[neighbor] = new_cost
+                # octile distance on uniform terrain
+                estimate = HeuristicOctile(neighbor, goal, straight, diagonal)
+                front.put(neighbor, (new_cost + estimate, estimate))
+                generated += 1
+                path[neighbor] = current
 
-                priority = new_cost + 10 * HeuristicManhattar(neighbor, goal) # Manhattan
+    if stats:
+        stats.add(expanded, generated)
 
-                front.put(neighbor, priority)
-                path[neighbor] = current
+    if goal not in path:
+        return False
 
-    # reconstruct path
-    current = goal
+    # reconstruct path, filling in the tiles jumped over
     trace = {}
+    current = goal
     while current != start:
-        trace[current] = path.get(current, False)
-        if not trace[current]:
-            return False
-        current = path[current]
+        parent = path[current]
+        dx = (parent[0] > current[0]) - (parent[0] < current[0])
+        dy = (parent[1] > current[1]) - (parent[1] < current[1])
+        while current != parent:
+            trace[current] = (current[0] + dx, current[1] + dy)
+            current = trace[current]
     trace[start] = None
-    return trace
\ No newline at end of file
+    return trace
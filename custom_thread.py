@@ -1,15 +1,81 @@
-import threading
-
-class BaseThread(threading.Thread):
-    def __init__(self, target_args=None, callback=None, callback_args=None, *args, **kwargs):
-        target = kwargs.pop('target')
-        super(BaseThread, self).__init__(target=self.target_with_callback, *args, **kwargs)
-        self.target_args = target_args
-        self.callback = callback
-        self.method = target
-        self.callback_args = callback_args
-
-    def target_with_callback(self):
-        result = self.method(*self.target_args)
-        if self.callback is not None:
-            self.callback(*self.callback_args, result)
\ No newline at end of file
+import collections
+import traceback
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+class WorkerPool:
+    # Fixed number of worker threads (or processes), callbacks are delivered by update() on the calling thread
+    # a blocking pool only starts its jobs in update() and waits for all of them, so results don't depend
+    # on worker timing and jobs never see the game half way through changing the grid
+    def __init__(self, max_workers=4, processes=False, initializer=None, initargs=(), blocking=False):
+        if processes:
+            self.executor = ProcessPoolExecutor(max_workers=max_workers, initializer=initializer, initargs=initargs)
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=max_workers, initializer=initializer, initargs=initargs)
+        self.max_workers = max_workers
+        self.blocking = blocking
+        self.pending = collections.deque()  # requests waiting for a free worker
+        self.running = []                   # (future, callback, callback_args)
+        self.completed = 0
+        self.max_queue_depth = 0
+
+    def submit(self, target, target_args=(), callback=None, callback_args=()):
+        self.pending.append((target, target_args, callback, callback_args))
+        self.max_queue_depth = max(self.max_queue_depth, len(self.pending))
+        if not self.blocking:
+            self.fill()
+
+    # Result that is already known (e.g. cached), delivered on the next update
+    def submit_result(self, result, callback=None, callback_args=()):
+        future = Future()
+        future.set_result(result)
+        if self.blocking:
+            # stays in line behind the jobs that haven't started yet
+            self.pending.append((future, (), callback, callback_args))
+        else:
+            self.running.append((future, callback, callback_args))
+
+    def fill(self):
+        # never hand the executor more work than there are workers
+        while self.pending and len(self.running) < self.max_workers:
+            target, target_args, callback, callback_args = self.pending.popleft()
+            future = target if isinstance(target, Future) else self.executor.submit(target, *target_args)
+            self.running.append((future, callback, callback_args))
+
+    def update(self):
+        finished = []
+        while True:
+            if self.blocking:
+                wait([job[0] for job in self.running])
+            running = []
+            for job in self.running:
+                if job[0].done():
+                    finished.append(job)
+                else:
+                    running.append(job)
+            self.running = running
+            self.fill()
+            if not self.blocking or not self.running:
+                break
+        # deliver results in submission order
+        for future, callback, callback_args in finished:
+            self.completed += 1
+            try:
+                result = future.result()
+            except Exception:
+                # a failed job is reported and counts as no result instead of stopping the game
+                traceback.print_exc()
+                result = False
+            if callback is not None:
+                callback(*callback_args, result)
+
+    def get_stats(self):
+        return {
+            "pending": len(self.pending),
+            "running": len(self.running),
+            "completed": self.completed,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+    def shutdown(self):
+        self.pending.clear()
+        self.executor.shutdown(wait=True)
@@ -1,7 +1,5 @@
 from enum import Enum, auto
-from random import randint
 
-import custom_thread as c_thread
 import game_entities as entities
 import game_time as time
 import message_dispatcher as dispatcher
@@ -39,7 +37,9 @@ class StateWaitForArtisan(State):
             target_artisans = []
             target_artisan_count = 0
             # count number of target_artisans and free artisans
-            for artisan in entity.owner.entities_where(lambda e: isinstance(e, entities.UnitArtisan) and e.is_visible):
+            for artisan in entity.owner.get_entities(entities.UnitArtisan):
+                if not artisan.is_visible:
+                    continue
                 if artisan.profession == entity.artisan_required:
                     target_artisan_count += 1
                     target_artisans.append(artisan)
@@ -159,10 +159,11 @@ class StateGather(State):
         if self.stage is Stage.Done:
             if not self.finding_path and entity.owner.target_resource:
                 self.target_resource = entity.owner.target_resource # save which recourse worker set out to gather
-                goal = entity.owner.get_resource_location(entity.location, self.target_resource[2]) # class
-                if goal:
+                goals = entity.owner.get_nearest_resource_locations(self.target_resource[2], entity.location, g_vars["Pathfinding"]["NearestResources"]) # class
+                if goals:
+                    # path to the closest reachable one
                     self.finding_path = True
-                    find_path(entity, entity.location, goal, get_path_callback)
+                    find_nearest_path(entity, entity.location, goals, get_path_callback)
 
         elif self.stage is Stage.Traversing:
             pass
@@ -172,7 +173,7 @@ class StateGather(State):
             if self.gather_completion and not self.finding_path:
                 self.finding_path = True
                 goal = entity.owner.start_position
-                find_path(entity, entity.location, goal, self.__get_delivery_path_callback)
+                find_flow_path(entity, entity.location, goal, self.__get_delivery_path_callback)
             # if gathering is completed
             elif self.gather_progress >= g_vars[self.target_resource[0]][self.target_resource[1]]["GatherTime"]:
                 self.gather_completion = True
@@ -192,7 +193,7 @@ class StateGather(State):
                 tile = entity.gamemap.get_background_tile(entity.location)
                 if tile.has_free_resource_type(self.target_resource[2]):
                     # occupy that resource and shange stage
-                    tile.occupy_resource(self.target_resource[2])
+                    entity.owner.occupy_tile_resource(tile, self.target_resource[2])
                     self.stage = Stage.Gathering
                 # else entity will find try to find another resource
                 else:
@@ -218,7 +219,7 @@ class StateGather(State):
             self.gather_completion = False
             # deduct one resource from tile and carry it
             tile = entity.gamemap.get_background_tile(entity.location)
-            entity.carried_resource = tile.deduct_resource(self.target_resource[2])
+            entity.carried_resource = entity.owner.deduct_tile_resource(tile, self.target_resource[2])
             # change stage and transport resource
             self.stage = Stage.Delivering
             entity.set_path(result)
@@ -233,8 +234,8 @@ class StateExplore(State):
         if self.stage is Stage.Done and not self.finding_path:
             self.finding_path = True
             loc = entity.location
-            goal = (randint(0, entity.gamemap.tile_width - 1), (randint(0, entity.gamemap.tile_height - 1)))
-            find_path(entity, loc, goal, get_path_callback, False)
+            goal = entity.gamemap.get_random_reachable_location(loc) or loc
+            find_incremental_path(entity, loc, goal, get_path_callback)
 
     def exit(self, entity):
         pass
@@ -270,19 +271,58 @@ class StateMove(State):
 
         return False
 
-# Method will create a separate thread and calculate a path between two points
-def find_path(entity, location, goal, __callback, fog=True):
+# Method will queue a path between two points on the map's path service, callback is called during GameMap.update
+def find_path(entity, location, goal, __callback, fog=True, engine=None):
         fog_filter_funtion = None
         # if Astar should find path through fog, pass it a function to do so
         if fog:
             fog_filter_funtion = entity.owner.gamemap.location_is_discovered
-        thread = c_thread.BaseThread(
-            target=entity.gamemap.get_path,
-            target_args=(location, goal, fog_filter_funtion),
-            callback=__callback,
-            callback_args=[entity]
+        entity.gamemap.request_path(
+            location, goal, fog_filter_funtion,
+            callback=deliver_path,
+            callback_args=[entity, entity.fsm.currentState, __callback],
+            engine=engine
+        )
+
+# Results for a state the entity has since left, or for a location it has left, are dropped
+def deliver_path(entity, state, __callback, result):
+    if entity.fsm.currentState is not state:
+        return
+    if result and entity.location not in result:
+        result = False
+    __callback(entity, result)
+
+# Method will queue a search for the closest reachable location out of goals, callback gets the path
+def find_nearest_path(entity, location, goals, __callback, fog=True):
+        fog_filter_funtion = None
+        if fog:
+            fog_filter_funtion = entity.owner.gamemap.location_is_discovered
+        entity.gamemap.request_nearest_path(
+            location, goals, fog_filter_funtion,
+            callback=deliver_nearest_path,
+            callback_args=[entity, entity.fsm.currentState, __callback]
         )
-        thread.start()
+
+def deliver_nearest_path(entity, state, __callback, result):
+    # a failed search job delivers False instead of (goal, path)
+    (goal, path) = result or (None, False)
+    deliver_path(entity, state, __callback, path)
+
+# Method will queue a path through fog that is repaired as tiles are discovered, callback is called during GameMap.update
+def find_incremental_path(entity, location, goal, __callback):
+        entity.gamemap.request_incremental_path(
+            location, goal,
+            callback=deliver_path,
+            callback_args=[entity, entity.fsm.currentState, __callback]
+        )
+
+# Method will look up the shared flow field towards goal, callback is called immediately
+def find_flow_path(entity, location, goal, __callback, fog=True):
+        fog_filter_funtion = None
+        if fog:
+            fog_filter_funtion = entity.owner.gamemap.location_is_discovered
+        field = entity.gamemap.get_flow_field(goal, fog_filter_funtion)
+        __callback(entity, field if location in field else False)
 
 def get_path_callback(entity, result):
     entity.fsm.currentState.finding_path = False
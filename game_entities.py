@@ -1,6 +1,6 @@
 from pygame import sprite
 from pygame import Surface
-from random import randint
+from random import Random
 from enum import Enum, auto
 
 import entity_state as states
@@ -9,6 +9,9 @@ import message_dispatcher as dispatcher
 import game_time as time
 from game_settings import g_vars
 
+# Drawing only jitter, kept apart from the simulation's random numbers
+visual_random = Random()
+
 #----------------------------BASE--------------------------------------#
 class BasicGameEntity(sprite.Sprite):
 
@@ -17,6 +20,7 @@ class BasicGameEntity(sprite.Sprite):
         self.owner = owner
         self.fsm = fsm.StateMachine(self)
         self.fsm.currentState = states.State() # empty state
+        self.fsm.on_change = owner.entity_changed
         # reference to map
         self.gamemap = owner.gamemap
         self.production_time = 0
@@ -24,38 +28,54 @@ class BasicGameEntity(sprite.Sprite):
         self.is_visible = False
         self.is_idle = False
 
+    # owner's entity registry follows the idle flag
+    @property
+    def is_idle(self):
+        return self._is_idle
+
+    @is_idle.setter
+    def is_idle(self, is_idle):
+        self._is_idle = is_idle
+        self.owner.entity_changed(self)
+
     def begin_production(self):
-        self.owner.production_list.append(self)
+        self.owner.add_production(self)
 
     def spawn(self):
         self.owner.add_entity(self)
-        #sprite/asset
-        self.image.fill(g_vars["Game"]["Colors"][self.tile_color])
-        self.rect = self.image.get_rect()
         # initial draw
         self.is_visible = True
-        self.rect.x = self.location[0] * g_vars["Game"]["TileSize"] + g_vars["Game"]["TileSize"] / 3
-        self.rect.y = self.location[1] * g_vars["Game"]["TileSize"] + g_vars["Game"]["TileSize"] / 3
+        if not self.gamemap.headless:
+            #sprite/asset
+            self.image.fill(g_vars["Game"]["Colors"][self.tile_color])
+            self.rect = self.image.get_rect()
+            self.rect.x = self.location[0] * g_vars["Game"]["TileSize"] + g_vars["Game"]["TileSize"] / 3
+            self.rect.y = self.location[1] * g_vars["Game"]["TileSize"] + g_vars["Game"]["TileSize"] / 3
+            self.previous_position = self.rect.topleft
+            self.gamemap.place_sprite(self)
         # state
         self.fsm.change_state(states.StateIdle())
 
     def update(self):
         # drawing
-        if self.is_visible:
+        if self.is_visible and not self.gamemap.headless:
+            self.previous_position = self.rect.topleft
             self.rect.x = self.location[0] * g_vars["Game"]["TileSize"] + g_vars["Game"]["TileSize"] / 3
             self.rect.y = self.location[1] * g_vars["Game"]["TileSize"] + g_vars["Game"]["TileSize"] / 3
+            self.gamemap.place_sprite(self)
         # state machine
         self.fsm.update()
 
     def delete(self):
         sprite.Sprite.remove(self, self.groups)
+        self.gamemap.remove_sprite(self)
 
 #----------------------------UNITS--------------------------------------#
 class BasicGameUnit(BasicGameEntity):
 
     def __init__(self, owner):
         self.groups = owner.gamemap.sprite_group_units
-        self.image = Surface((g_vars["Game"]["UnitSize"], g_vars["Game"]["UnitSize"]))
+        self.image = None if owner.gamemap.headless else Surface((g_vars["Game"]["UnitSize"], g_vars["Game"]["UnitSize"]))
         BasicGameEntity.__init__(self, owner)
         self.move_factor = g_vars["Unit"]["Basic"]["MoveFactor"]
         self.move_progress = 0
@@ -120,14 +140,14 @@ class UnitWorker(BasicGameUnit):
     def begin_production(self):
         super().begin_production()
         # get structure
-        self.origin_structure = self.owner.entities_where(lambda e: isinstance(e, StructureCamp) and e.is_idle)[0]
+        self.origin_structure = self.owner.get_entities(StructureCamp, 1, idle=True)[0]
         # occupy structure
         self.origin_structure.fsm.change_state(states.StateLocked())
         # change to production state
         self.fsm.change_state(states.StateProduced())
 
     def production_spawn(self):
-        self.owner.production_list.remove(self)
+        self.owner.remove_production(self)
         # position to building
         self.location = self.origin_structure.location
         # spawn
@@ -148,14 +168,14 @@ class UnitExplorer(BasicGameUnit):
     def begin_production(self):
         super().begin_production()
         # find free worker
-        self.worker_unit = self.owner.entities_where(lambda e: isinstance(e, UnitWorker) and e.is_idle)[0]
+        self.worker_unit = self.owner.get_entities(UnitWorker, 1, idle=True)[0]
         # pause worker for production time
         self.worker_unit.fsm.change_state(states.StateLocked())
         # change to production state
         self.fsm.change_state(states.StateProduced())
 
     def production_spawn(self):
-        self.owner.production_list.remove(self)
+        self.owner.remove_production(self)
         # put explorer where worker stood
         self.location = self.worker_unit.location
         super().spawn()
@@ -183,7 +203,7 @@ class UnitExplorer(BasicGameUnit):
             new_resources.update(self.gamemap.discover_fog_area(start, stop))
             
         if new_resources:
-            self.owner.resource_map.update(new_resources)
+            self.owner.discover_resources(new_resources)
 
 
 class UnitArtisan(BasicGameUnit):
@@ -205,14 +225,14 @@ class UnitArtisan(BasicGameUnit):
     def begin_production(self):
         super().begin_production()
         # find free worker
-        self.worker_unit = self.owner.entities_where(lambda e: isinstance(e, UnitWorker) and e.is_idle)[0]
+        self.worker_unit = self.owner.get_entities(UnitWorker, 1, idle=True)[0]
         # pause worker for production time
         self.worker_unit.fsm.change_state(states.StateLocked())
         # change to production state
         self.fsm.change_state(states.StateProduced())
 
     def production_spawn(self):
-        self.owner.production_list.remove(self)
+        self.owner.remove_production(self)
         # put explorer where worker stood
         self.location = self.worker_unit.location
         super().spawn()
@@ -232,14 +252,14 @@ class UnitSoldier(BasicGameUnit):
     def begin_production(self):
         super().begin_production()
         # find free worker
-        self.worker_unit = self.owner.entities_where(lambda e: isinstance(e, UnitWorker) and e.is_idle)[0]
+        self.worker_unit = self.owner.get_entities(UnitWorker, 1, idle=True)[0]
         # pause worker for production time
         self.worker_unit.fsm.change_state(states.StateLocked()) # change to become soldier
         # change to production state
         self.fsm.change_state(states.StateProduced())
 
     def production_spawn(self):
-        self.owner.production_list.remove(self)
+        self.owner.remove_production(self)
         # put explorer where worker stood
         self.location = self.worker_unit.location
         super().spawn()
@@ -255,7 +275,7 @@ class UnitSoldier(BasicGameUnit):
 class BasicGameStructure(BasicGameEntity):
     def __init__(self, owner):
         self.groups = owner.gamemap.sprite_group_structures
-        self.image = Surface((g_vars["Game"]["StructureSize"], g_vars["Game"]["StructureSize"]))
+        self.image = None if owner.gamemap.headless else Surface((g_vars["Game"]["StructureSize"], g_vars["Game"]["StructureSize"]))
         BasicGameEntity.__init__(self, owner)
         self.production_time = g_vars["Structure"]["Base"]["ProductionTime"]
         self.output = g_vars["Structure"]["Base"]["Output"]
@@ -281,7 +301,7 @@ class BasicGameStructure(BasicGameEntity):
         self.fsm.change_state(states.StateWaitForArtisan())
 
     def production_spawn(self):
-        self.owner.production_list.remove(self)
+        self.owner.remove_production(self)
         super().spawn()
         # remove base
         self.owner.remove_entity(self.structure_base)
@@ -350,38 +370,47 @@ class StructureEncampment(BasicGameStructure):
         self.output = g_vars["Structure"]["Encampment"]["Output"]
 
 #----------------------------RESOURCES??--------------------------------------#
+# Resources on map tiles are only drawn (by MapRenderer) and join no updated sprite group
 class BasicMapResource(sprite.Sprite):
-    def __init__(self, gamemap, location):
-        self.groups = gamemap.sprite_group_resources
+    def __init__(self, gamemap, location, groups=()):
+        self.groups = groups
         sprite.Sprite.__init__(self, self.groups)
-        self.image = Surface((g_vars["Game"]["ResourceSize"], g_vars["Game"]["ResourceSize"]))
-        self.image.fill(g_vars["Game"]["Colors"][self.tile_color])
-        self.rect = self.image.get_rect()
-        self.rect.x = location[0] * g_vars["Game"]["TileSize"] + randint(0, g_vars["Game"]["TileSize"])
-        self.rect.y = location[1] * g_vars["Game"]["TileSize"] + randint(0, g_vars["Game"]["TileSize"])
+        self.image = None
+        self.rect = None
+        if not gamemap.headless:
+            self.image = Surface((g_vars["Game"]["ResourceSize"], g_vars["Game"]["ResourceSize"]))
+            self.image.fill(g_vars["Game"]["Colors"][self.tile_color])
+            self.rect = self.image.get_rect()
+            self.rect.x = location[0] * g_vars["Game"]["TileSize"] + visual_random.randint(0, g_vars["Game"]["TileSize"])
+            self.rect.y = location[1] * g_vars["Game"]["TileSize"] + visual_random.randint(0, g_vars["Game"]["TileSize"])
 
     def delete(self):
         sprite.Sprite.remove(self, self.groups)
 
 class WildTree(BasicMapResource):
+    gathered_type = g_vars["Exploration"]["WildTree"]["GatheredType"]
+
     def __init__(self, gamemap, location):
         self.tile_color = "Yellow"
         super().__init__(gamemap, location)
-        self.gathered_type = g_vars["Exploration"]["WildTree"]["GatheredType"]
 
 class WildIronOre(BasicMapResource):
+    gathered_type = g_vars["Exploration"]["WildIronOre"]["GatheredType"]
+
     def __init__(self, gamemap, location):
         self.tile_color = "Gray"
         super().__init__(gamemap, location)
-        self.gathered_type = g_vars["Exploration"]["WildIronOre"]["GatheredType"]    
 
 class BasicResource(BasicMapResource):
+    is_idle = BasicGameEntity.is_idle
+
     def __init__(self, owner):
         self.owner = owner
         self.tile_color = "Black"
-        super().__init__(owner.gamemap, owner.start_position)
+        super().__init__(owner.gamemap, owner.start_position, owner.gamemap.sprite_group_resources)
         self.fsm = fsm.StateMachine(self)
         self.fsm.currentState = states.State()
+        self.fsm.on_change = owner.entity_changed
         self.is_idle = False    # can be used when structures need to occupy resource
         self.is_visible = False
         self.origin_structure = None
@@ -391,10 +420,10 @@ class BasicResource(BasicMapResource):
         self.fsm.update()
 
     def begin_production(self):
-        self.owner.production_list.append(self)
+        self.owner.add_production(self)
 
     def production_spawn(self):
-        self.owner.production_list.remove(self)
+        self.owner.remove_production(self)
         self.is_idle = True
         self.is_visible = True
         # change state
@@ -418,7 +447,7 @@ class Coal(BasicResource):
     def begin_production(self):
         super().begin_production()
         # get structure
-        self.origin_structure = self.owner.entities_where(lambda e: isinstance(e, StructureRefinery) and e.is_idle)[0]
+        self.origin_structure = self.owner.get_entities(StructureRefinery, 1, idle=True)[0]
         # occupy structure
         self.origin_structure.fsm.change_state(states.StateLocked())
         # change to production state
@@ -436,7 +465,7 @@ class IronBar(BasicResource):
     def begin_production(self):
         super().begin_production()
         # get structure
-        self.origin_structure = self.owner.entities_where(lambda e: isinstance(e, StructureSmelter) and e.is_idle)[0]
+        self.origin_structure = self.owner.get_entities(StructureSmelter, 1, idle=True)[0]
         # occupy structure
         self.origin_structure.fsm.change_state(states.StateLocked())
         # change to production state
@@ -454,7 +483,7 @@ class Sword(BasicResource):
     def begin_production(self):
         super().begin_production()
         # get structure
-        self.origin_structure = self.owner.entities_where(lambda e: isinstance(e, StructureSmithy) and e.is_idle)[0]
+        self.origin_structure = self.owner.get_entities(StructureSmithy, 1, idle=True)[0]
         # occupy structure
         self.origin_structure.fsm.change_state(states.StateLocked())
         # change to production state
@@ -18,10 +18,13 @@ from game_settings import g_vars
 
 class Game:
 
-    def __init__(self):
-        pg.init()
-        pg.display.set_caption(g_vars["Game"]["Title"])
-        self.map = gamemap.GameMap()
+    # headless: no display or rendering, the simulation is stepped with run_headless
+    def __init__(self, headless=False):
+        self.headless = headless
+        if not headless:
+            pg.init()
+            pg.display.set_caption(g_vars["Game"]["Title"])
+        self.map = gamemap.GameMap(headless)
         self.speed = 100
         self.paused = False
         self.draw_grid = False
@@ -30,13 +33,18 @@ class Game:
         self.draw_ui_resources = False
         self.draw_ui_entities = False
         self.ai_player = None
+        self.scheduler = time.FixedStep(g_vars["Game"]["TimeStep"], g_vars["Game"]["MaxStepsPerFrame"])
+        self.ui_tasks = UIPanel()
+        self.ui_resources = UIPanel((230, 0))
+        self.ui_entities = UIPanel((230, 40))
 
     # Specify a gamemap to use
     def set_map(self, map_name):
         # load map
         self.map.load_map_template(map_name)
         # Updates screen size to loaded map
-        self.screen = pg.display.set_mode((g_vars["Game"]["ScreenWidth"], g_vars["Game"]["ScreenHeight"]))
+        if not self.headless:
+            self.screen = pg.display.set_mode((g_vars["Game"]["ScreenWidth"], g_vars["Game"]["ScreenHeight"]))
 
     def enable_explorer(self):
         #self.explorer = entities.UnitExplorer(self.map, (2, 2))
@@ -44,7 +52,7 @@ class Game:
 
     def enable_ai(self):
         self.ai_player = ai.AI(self.map, (2, 2))
-        self.ai_player.resource_map.update(self.map.discover_fog_area((1, 1), (50, 50)))
+        self.ai_player.discover_resources(self.map.discover_fog_area((1, 1), (50, 50)))
         self.ai_player.append_goal(["Unit", "Soldier", 20])
 
         for x in range(0, 50):
@@ -52,7 +60,7 @@ class Game:
             worker.spawn()
 
     def init_thorpy(self):
-        res_trees = thorpy.OneLineText("Trees: " + str(len(self.ai_player.entities_where(lambda e: isinstance(e, entities.Tree)))))
+        res_trees = thorpy.OneLineText("Trees: " + str(self.ai_player.count_entities(entities.Tree)))
         self.box = thorpy.Box(elements=[res_trees])
         self.box_u = thorpy.Box(elements=[res_trees])
         self.box_r = thorpy.Box(elements=[res_trees])
@@ -64,38 +72,33 @@ class Game:
         #use the elements normally...
         self.box.set_topleft((0, 0))
 
+    # Draws the shown panels, returns their screen rects
     def update_thorpy(self):
+        rects = []
         # tasks
         if self.draw_ui_tasks:
-            goal = thorpy.MultilineText(str(self.ai_player.current_goal), (220, 50))
-            task = thorpy.MultilineText(str(self.ai_player.current_task), (220, 50))
-            task_list = thorpy.MultilineText(str(self.ai_player.task_list.elements), (220, 600))
-            self.box = thorpy.Box(elements=[goal, task, task_list])
-            self.box.blit()
-            self.box.update()
+            rects.append(self.ui_tasks.draw([
+                (str(self.ai_player.current_goal), (220, 50)),
+                (str(self.ai_player.current_task), (220, 50)),
+                (str(self.ai_player.task_list.elements), (220, 600))]))
 
         # resources
         if self.draw_ui_resources:
-            resources = thorpy.MultilineText("Trees: " + str(len(self.ai_player.entities_where(lambda e: isinstance(e, entities.Tree))))
-            + "          Coal: " + str(len(self.ai_player.entities_where(lambda e: isinstance(e, entities.Coal))))
-            + "          IronOre: " + str(len(self.ai_player.entities_where(lambda e: isinstance(e, entities.IronOre))))
-            + "          IronBar: " + str(len(self.ai_player.entities_where(lambda e: isinstance(e, entities.IronBar))))
-            + "          Swords: " + str(len(self.ai_player.entities_where(lambda e: isinstance(e, entities.Sword)))), (600, 30))
-            self.box_r = thorpy.Box(elements=[resources])
-            self.box_r.set_topleft((230, 0))
-            self.box_r.blit()
-            self.box_r.update()
+            count = self.ai_player.count_entities
+            rects.append(self.ui_resources.draw([("Trees: " + str(count(entities.Tree))
+            + "          Coal: " + str(count(entities.Coal))
+            + "          IronOre: " + str(count(entities.IronOre))
+            + "          IronBar: " + str(count(entities.IronBar))
+            + "          Swords: " + str(count(entities.Sword)), (600, 30))]))
 
         # units
         if self.draw_ui_entities:
-            units = thorpy.MultilineText("Workers: " + str(len(self.ai_player.entities_where(lambda e: isinstance(e, entities.UnitWorker))))
-            + "          Explorers: " + str(len(self.ai_player.entities_where(lambda e: isinstance(e, entities.UnitExplorer))))
-            + "          Artisans: " + str(len(self.ai_player.entities_where(lambda e: isinstance(e, entities.UnitArtisan))))
-            + "          Soldiers: " + str(len(self.ai_player.entities_where(lambda e: isinstance(e, entities.UnitSoldier)))), (500, 30))
-            self.box_u = thorpy.Box(elements=[units])
-            self.box_u.set_topleft((230, 40))
-            self.box_u.blit()
-            self.box_u.update()
+            count = self.ai_player.count_entities
+            rects.append(self.ui_entities.draw([("Workers: " + str(count(entities.UnitWorker))
+            + "          Explorers: " + str(count(entities.UnitExplorer))
+            + "          Artisans: " + str(count(entities.UnitArtisan))
+            + "          Soldiers: " + str(count(entities.UnitSoldier)), (500, 30))]))
+        return rects
 
     def enable_fog(self):
         self.map.draw_fog = True
@@ -103,20 +106,33 @@ class Game:
     def run(self):
         self.running = True
         while (self.running):
-            time.clock.update(g_vars["Game"]["FPS"], self.speed)
+            # simulated time this frame, run as fixed steps in update
+            frame_time = time.clock.tick(g_vars["Game"]["FPS"]) * self.speed
             self.events()
-            self.update()
+            self.update(frame_time)
             self.draw()
 
-    def update(self):
-        # send screen to map for blit
-        if not self.paused:
-            self.map.update()
+    # Runs steps simulation steps as fast as possible, call map.shutdown() when done
+    # a windowed run with the same seed only gives the same results with Pathfinding.Deterministic
+    def run_headless(self, steps):
+        for step in range(steps):
+            time.clock.advance(self.scheduler.delta)
+            self.step()
+
+    # One simulation step, shared by the windowed and headless loops
+    def step(self):
+        self.map.update()
 
         # AI
-        if self.ai_player and not self.paused:
+        if self.ai_player:
             self.ai_player.update()
 
+    def update(self, frame_time=0.0):
+        if not self.paused:
+            for step in range(self.scheduler.frame(frame_time)):
+                time.clock.advance(self.scheduler.delta)
+                self.step()
+
         # catch inputs
         keystate = pg.key.get_pressed()
         if keystate[pg.K_ESCAPE]:
@@ -143,6 +159,8 @@ class Game:
             self.draw_ui_entities = not self.draw_ui_entities
         if keystate[pg.K_g]:
             self.draw_grid = not self.draw_grid
+            # lines are only drawn again where the map changes, hiding them needs a whole map
+            self.map.renderer.redraw()
         if keystate[pg.K_q]:
             self.draw_ui = not self.draw_ui
         if keystate[pg.K_w]:
@@ -154,28 +172,56 @@ class Game:
         if keystate[pg.K_d]:
             self.map.camera.move(dx=1)
 
-    def draw_grid_overlay(self):
-        for x in range(0, self.map.width, g_vars["Game"]["TileSize"]):
-            pg.draw.line(self.screen, g_vars["Game"]["Colors"]["LightGray"], (x, 0), (x, self.map.height))
-        for y in range(0, self.map.height, g_vars["Game"]["TileSize"]):
-            pg.draw.line(self.screen, g_vars["Game"]["Colors"]["LightGray"], (0, y), (self.map.width, y))
+    # Grid lines over the whole map, or only inside rects
+    def draw_grid_overlay(self, rects=None):
+        tile_size = g_vars["Game"]["TileSize"]
+        color = g_vars["Game"]["Colors"]["LightGray"]
+        map_rect = pg.Rect(0, 0, self.map.width, self.map.height)
+        for rect in [map_rect] if rects is None else rects:
+            rect = rect.clip(map_rect)
+            for x in range(-(-rect.left // tile_size) * tile_size, rect.right, tile_size):
+                pg.draw.line(self.screen, color, (x, rect.top), (x, rect.bottom - 1))
+            for y in range(-(-rect.top // tile_size) * tile_size, rect.bottom, tile_size):
+                pg.draw.line(self.screen, color, (rect.left, y), (rect.right - 1, y))
 
     def draw(self):
-        # Background
-        self.screen.fill(g_vars["Game"]["Colors"]["LightGray"])
-        # Tiles
-        self.map.draw(self.screen)
-        # Overlay
+        # Background and tiles, dirty is None when the whole screen was drawn
+        dirty = self.map.draw(self.screen, self.scheduler.alpha)
+        # Overlay, only where the map was drawn
         if self.draw_grid:
-            self.draw_grid_overlay()
-        # UI
+            self.draw_grid_overlay(dirty)
+        # UI, the map under the panels is put back next frame
         if self.draw_ui:
-            self.update_thorpy()
+            panels = self.update_thorpy()
+            self.map.renderer.add_overlays(panels)
+            if dirty is not None:
+                dirty.extend(panels)
         # Flip
-        pg.display.flip()
+        if dirty is None:
+            pg.display.flip()
+        else:
+            pg.display.update(dirty)
 
     def events(self):
         # catch events here
         for event in pg.event.get():
             if event.type == pg.QUIT:
+                self.map.shutdown()
                 pg.quit()
+
+# thorpy box that is only rebuilt when its text changes
+class UIPanel:
+    def __init__(self, topleft=None):
+        self.topleft = topleft
+        self.lines = None   # [(text, size)] shown by box
+        self.box = None
+
+    def draw(self, lines):
+        if lines != self.lines:
+            self.lines = lines
+            self.box = thorpy.Box(elements=[thorpy.MultilineText(text, size) for (text, size) in lines])
+            if self.topleft:
+                self.box.set_topleft(self.topleft)
+        self.box.blit()
+        self.box.update()
+        return self.box.get_rect()
@@ -1,27 +1,62 @@
 import pygame as pg
+import collections
+import itertools
+import weakref
 from os import path
 from random import randint
 
 import game_assets as assets
 import game_tiles as tiles
 import game_entities as entities
+import game_time as time
 import algorithms as alg
+import custom_thread as c_thread
+import map_cache
+import map_generator
+import map_renderer
+import path_process
 from game_settings import g_vars
 
+# template char -> tile class
+tile_types = {"T": "Forest", "V": "Water", "G": "Bog", "B": "Mountain", "M": "Ground"}
+
 class GameMap:
 
-    def __init__(self):
+    # a headless map keeps no surfaces or tile sprites and is never drawn
+    def __init__(self, headless=False):
+        self.headless = headless
         self.sprite_group_background = pg.sprite.Group()
-        self.sprite_group_fog = pg.sprite.Group()
         self.sprite_group_units = pg.sprite.Group()
         self.sprite_group_structures = pg.sprite.Group()
         self.sprite_group_resources = pg.sprite.Group()
-        self.tile_data = {}
-        self.fog_data = {}
+        self.sprite_indexes = {     # group -> SpriteIndex of its drawn sprites
+            self.sprite_group_structures: map_renderer.SpriteIndex(),
+            self.sprite_group_units: map_renderer.SpriteIndex(),
+        }
+        self.tile_data = {}     # tiles created so far, see get_background_tile
+        self.map_data = None    # CompiledMap of the loaded template
+        self.ore_layout = {}    # tile index -> ore nodes
+        self.discovered_grid = None # one byte per tile, 1 once discovered
         self.occupied_tiles = {}
-        self.unpassable_tiles = []
+        self.unpassable_tiles = set()
         self.weighted_graph = None
+        self.components = None  # ConnectedComponents over passable tiles
+        self.use_grid_graph = True  # pathfinding reads flat arrays instead of tile sprites
+        self.path_cache = alg.LRUCache(g_vars["Pathfinding"]["PathCacheSize"])
+        self.flow_fields = {}   # (goal, fog-mode) -> FlowField
+        self.hierarchical_graphs = {}   # fog-mode -> HierarchicalGraph
+        self.jump_point_boundary = None # tiles where jump point search can't skip ahead
+        self.heuristic = None
+        self.search_stats = alg.SearchStats()
+        self.incremental_planners = weakref.WeakSet() # DStarLite planners of walking units
+        self.path_engine = g_vars["Pathfinding"]["Engine"]    # "astar", "hpa" or "jps"
+        self.path_backend = g_vars["Pathfinding"]["Backend"]   # "thread", "process" or "sliced"
+        self.path_service = None
+        self.node_budget = 0    # expansions before a search through fog gives up, see get_node_budget
+        self.sliced_searches = collections.deque()  # AstarSearch and DStarLite jobs advanced a slice per update
+        self.shared_grid = None
         self.camera = None
+        self.renderer = None
         self.width = 0
         self.height = 0
         self.tile_width = 0
@@ -29,120 +64,219 @@ class GameMap:
 
         self.draw_fog = False
 
-    def load_map_template(self, template_name):
-        # Open map template
-        with open(path.join(assets.map_folder, template_name), "rt") as f:
-
-            # Construct tiles from map file
-            for y, row in enumerate(f):
-                row = row.strip("\n")
-                # count map height
-                self.tile_height += 1
-                self.tile_width = 0
-
-                for x, tile in enumerate(row):
-                    # count map width (lazy mf)
-                    self.tile_width += 1
-
-                    # fog is everywhere
-                    self.fog_data[(x, y)] = tiles.Fog(self, (x, y))
-                    
-                    new_tile = None
-                    if tile == "T": # Forest
-                        new_tile = tiles.Forest(self, (x, y))
-                        new_tile.add_resource(entities.WildTree, 5)
-
-                    elif tile == "V": # Water
-                        new_tile = tiles.Water(self, (x, y))
-                        self.unpassable_tiles.append((x, y))
-                        
-                    elif tile == "G": # Bog
-                        new_tile = tiles.Bog(self, (x, y))
-                       
-                    elif tile == "B": # Mountain
-                        new_tile = tiles.Mountain(self, (x, y))
-                        self.unpassable_tiles.append((x, y))
-                    
-                    elif tile == "M": # Ground
-                        new_tile = tiles.Ground(self, (x, y))
-                    
-                    self.tile_data[(x, y)] = new_tile
-
-        for i in range(0, 360):
-            tile = self.get_random_background_tile()
-            while not tile.passable:
-                tile = self.get_random_background_tile()
-            tile.add_resource(entities.WildIronOre, 1)
+    # Generated template of the given size, ore nodes follow the generator's ore density
+    def load_generated_map(self, width=None, height=None, seed=None):
+        settings = g_vars["MapGenerator"]
+        width, height = width or settings["Width"], height or settings["Height"]
+        seed = settings["Seed"] if seed is None else seed
+        template_name = map_generator.generate_map_file(width, height, seed)
+        self.load_map_template(template_name, int(width * height * settings["OreDensity"]), seed)
+
+    # seed places the ores the same way every time, otherwise they follow the random module
+    def load_map_template(self, template_name, ore_count=None, seed=None):
+        if ore_count is None:
+            ore_count = g_vars["Game"]["OreNodes"]
+        # terrain and ore layout come from the compiled template, tiles are created when first used
+        passable_chars = [char for char, name in tile_types.items() if tiles.get_tile_pathing(name)[0]]
+        self.map_data = map_cache.load_map(path.join(assets.map_folder, template_name), ore_count, passable_chars, seed)
+        self.tile_width, self.tile_height = self.map_data.width, self.map_data.height
+        # the compiled ore layout is only reused when asked for, otherwise every load places new ores
+        ore_tiles = self.map_data.ore_tiles
+        if not g_vars["Game"]["KeepOreLayout"]:
+            ore_tiles = map_cache.place_ores(self.map_data.terrain, ore_count, passable_chars, seed)
+        self.ore_layout = {}
+        for i in ore_tiles:
+            self.ore_layout[i] = self.ore_layout.get(i, 0) + 1
 
         self.width = self.tile_width * g_vars["Game"]["TileSize"]
         self.height = self.tile_height * g_vars["Game"]["TileSize"]
 
-        self.weighted_graph = alg.WeightedGraph(self)
+        # fog is everywhere
+        self.discovered_grid = bytearray(self.tile_width * self.tile_height)
+
+        self.heuristic = alg.MakeHeuristic(*get_heuristic_config())
+        settings = g_vars["Pathfinding"]
+        self.node_budget = max(settings["NodeBudget"], int(self.tile_width * self.tile_height * settings["NodeBudgetPerTile"]))
+
+        if self.use_grid_graph:
+            if self.path_backend == "process":
+                # worker processes read the same passability/cost arrays
+                self.shared_grid = path_process.SharedGrid(self.tile_width, self.tile_height)
+                self.weighted_graph = self.shared_grid.create_graph()
+                self.discovered_grid = self.shared_grid.discovered_grid
+            else:
+                self.weighted_graph = alg.GridGraph(self.tile_width, self.tile_height)
+            self.load_pathing()
+            self.weighted_graph.build_neighbors()
+            if self.shared_grid:
+                # built once here for every worker, kept in sync in set_background_tile
+                self.jump_point_boundary = self.shared_grid.boundary_grid
+                self.jump_point_boundary[:] = alg.BoundaryMask(self.weighted_graph, get_uniform_movement_cost())
+            # clusters for hierarchical pathfinding, built lazily per cluster
+            for fog, filter_function in ((False, None), (True, self.location_is_discovered)):
+                self.hierarchical_graphs[fog] = alg.HierarchicalGraph(
+                    self.weighted_graph, g_vars["Pathfinding"]["ClusterSize"], filter_function, get_min_movement_cost()[0], self.heuristic, self.get_node_budget(filter_function))
+        else:
+            self.weighted_graph = alg.WeightedGraph(self)
+        self.components = alg.ConnectedComponents(self.weighted_graph, self.tile_width, self.tile_height)
+
+        # headless runs must give the same results every time, windowed runs only match them with
+        # Pathfinding.Deterministic, otherwise paths arrive whenever the workers finish
+        blocking = self.headless or g_vars["Pathfinding"]["Deterministic"]
+        if self.shared_grid:
+            initargs = (self.shared_grid.name, self.tile_width, self.tile_height, get_uniform_movement_cost(), get_heuristic_config(), self.node_budget)
+            self.path_service = c_thread.WorkerPool(g_vars["Pathfinding"]["Workers"], True, path_process.init_worker, initargs, blocking)
+        else:
+            self.path_service = c_thread.WorkerPool(g_vars["Pathfinding"]["Workers"], blocking=blocking)
         self.camera = Camera(self.width, self.height)
+        if not self.headless:
+            self.renderer = map_renderer.MapRenderer(self)
+
+    def shutdown(self):
+        if self.path_service:
+            self.path_service.shutdown()
+        if self.shared_grid:
+            self.shared_grid.close(unlink=True)
+        if self.map_data:
+            self.map_data.close()
 
     def update(self):
-        self.sprite_group_background.update()
+        # finished path requests are handed back on the main loop
+        self.path_service.update()
+        self.update_sliced_searches()
         self.sprite_group_resources.update()
         self.sprite_group_structures.update()
         self.sprite_group_units.update()
-        self.sprite_group_fog.update()
-
-    def draw(self, screen):
-        # loop through all tiles
-        for x in range(0, self.tile_width):
-            for y in range(0, self.tile_height):
-
-                # check if fog
-                if self.draw_fog:
-                    tile = self.get_fog_tile((x, y))
-                    # draw fog if it exists
-                    if tile:
-                        screen.blit(tile.image, self.camera.apply(tile))
-                        continue
-                
-                # draw background
-                tile = self.get_background_tile((x, y))
-                screen.blit(tile.image, self.camera.apply(tile))
-                # draw resource if any
-                if tile.has_resources_remaining():
-                    for resource in tile.resource_list:
-                        screen.blit(resource.image, self.camera.apply(resource))
 
-        for sprite in self.sprite_group_structures:
-            if sprite.is_visible:
-                screen.blit(sprite.image, self.camera.apply(sprite))
+    # Returns the changed screen rects, or None when the whole screen was drawn
+    def draw(self, screen, alpha=1.0):
+        # only sprites on tiles inside the camera view
+        area = self.camera.get_visible_area(*screen.get_size())
+        sprites = itertools.chain(*(self.sprite_indexes[group].query(area) for group in (self.sprite_group_structures, self.sprite_group_units)))
+        return self.renderer.draw(screen, sprites, alpha)
+
+    # Keeps the draw index in step with an entity's location
+    def place_sprite(self, sprite):
+        index = self.sprite_indexes.get(sprite.groups)
+        if index is not None:
+            index.move(sprite, sprite.location)
+
+    def remove_sprite(self, sprite):
+        index = self.sprite_indexes.get(sprite.groups)
+        if index is not None:
+            index.remove(sprite)
 
-        for sprite in self.sprite_group_units:
-            if sprite.is_visible:
-                screen.blit(sprite.image, self.camera.apply(sprite))
+    def redraw_tiles(self, locations):
+        if self.renderer:
+            self.renderer.redraw_tiles(locations)
 
     def get_background_tile(self, cords):
-        return self.tile_data[cords]
+        tile = self.tile_data.get(cords)
+        if tile is None:
+            tile = self.create_tile(cords)
+        return tile
+
+    def get_tile_type(self, cords):
+        tile = self.tile_data.get(cords)
+        return tile.tile_color if tile else tile_types[self.map_data.terrain_at(cords)]
+
+    # Tile at cords if it has (or starts with) resources, otherwise None
+    def get_resource_tile(self, cords):
+        tile = self.tile_data.get(cords)
+        if tile is None and (self.map_data.terrain_at(cords) == "T" or (cords[1] * self.tile_width + cords[0]) in self.ore_layout):
+            tile = self.create_tile(cords)
+        return tile if tile and tile.has_resources_remaining() else None
+
+    # Tile built from the compiled template, with its starting resources
+    def create_tile(self, cords):
+        name = tile_types[self.map_data.terrain_at(cords)]
+        tile = getattr(tiles, name)(self, cords)
+        if name == "Forest":
+            tile.add_resource(entities.WildTree, 5)
+        ores = self.ore_layout.get(cords[1] * self.tile_width + cords[0])
+        if ores:
+            tile.add_resource(entities.WildIronOre, ores)
+        self.tile_data[cords] = tile
+        return tile
+
+    # Pathing arrays filled straight from the terrain, without creating tiles
+    def load_pathing(self):
+        pathing = dict((ord(char), tiles.get_tile_pathing(name)) for char, name in tile_types.items())
+        for i, char in enumerate(self.map_data.terrain):
+            location = (i % self.tile_width, i // self.tile_width)
+            (passable, movement_straight, movement_diagonal) = pathing[char]
+            if not passable:
+                self.unpassable_tiles.add(location)
+            self.weighted_graph.set_tile(location, passable, movement_straight, movement_diagonal)
+
+    def set_background_tile(self, cords, tile):
+        old_tile = self.tile_data.get(cords)
+        if old_tile:
+            self.remove_tile(old_tile)
+        self.tile_data[cords] = tile
+        self.redraw_tiles([cords])
+        # keep pathing data in sync with the new terrain
+        self.unpassable_tiles.discard(cords)
+        if not tile.passable:
+            self.unpassable_tiles.add(cords)
+        if self.weighted_graph:
+            self.update_pathing_tile(tile)
+            # passability or cost changed -> every cached path may be wrong
+            self.path_cache.clear()
+            for field in self.flow_fields.values():
+                field.rebuild()
+            for hierarchical_graph in self.hierarchical_graphs.values():
+                hierarchical_graph.mark_dirty([cords])
+            if self.jump_point_boundary is not None:
+                alg.UpdateBoundaryMask(self.jump_point_boundary, self.weighted_graph, get_uniform_movement_cost(), [cords])
+            self.components.update(cords, tile.passable)
+            for planner in self.incremental_planners:
+                planner.notify_changed([cords])
+
+    def update_pathing_tile(self, tile):
+        if isinstance(self.weighted_graph, alg.GridGraph):
+            self.weighted_graph.set_tile(tile.location, tile.passable, tile.movement_straight, tile.movement_diagonal)
 
     def get_random_background_tile(self):
         x, y = randint(0, self.tile_width - 1), randint(0, self.tile_height - 1)
-        return self.tile_data[(x, y)]
-
-    def get_fog_tile(self, cords):
-        return self.fog_data.get(cords, False)
+        return self.get_background_tile((x, y))
 
     def remove_tile(self, tile):
         pg.sprite.Sprite.remove(tile, tile.groups)
     
     def discover_fog_area(self, start, stop):
         discovered_resources = {}
-        (x1, y1), (x2, y2) = start, stop
-        for x in range(x1, x2 + 1):
-            for y in range(y1, y2 + 1):
-                # get fog tile if it exists
-                tile = self.get_fog_tile((x, y))
-                if tile:
-                    del self.fog_data[(x, y)]
-                    self.remove_tile(tile)
-                    # add to discovered map
-                    discovered_tile = self.get_background_tile((x, y))
-                    if discovered_tile.has_resources_remaining():
+        discovered = []
+        x1, y1 = max(start[0], 0), max(start[1], 0)
+        x2, y2 = min(stop[0], self.tile_width - 1), min(stop[1], self.tile_height - 1)
+        if x1 > x2:
+            return discovered_resources
+        row_length = x2 - x1 + 1
+        for y in range(y1, y2 + 1):
+            # reveal one row of the area at a time
+            i = y * self.tile_width + x1
+            row = bytes(self.discovered_grid[i:i + row_length])
+            if 0 not in row:
+                continue
+            self.discovered_grid[i:i + row_length] = b"\x01" * row_length
+            for x in range(x1, x2 + 1):
+                if not row[x - x1]:
+                    # add to discovered map, only tiles with resources are created
+                    discovered_tile = self.get_resource_tile((x, y))
+                    if discovered_tile:
                         discovered_resources[(x, y)] = discovered_tile
+                    discovered.append((x, y))
+        # paths restricted to discovered tiles may now be shorter or possible
+        if discovered:
+            self.redraw_tiles(discovered)
+            self.path_cache.remove_where(lambda key: key[2])
+            for (goal, fog), field in self.flow_fields.items():
+                if fog:
+                    field.update(discovered)
+            if True in self.hierarchical_graphs:
+                self.hierarchical_graphs[True].mark_dirty(discovered)
+            for planner in self.incremental_planners:
+                planner.notify_changed(discovered)
         return discovered_resources
 
     def get_buildable_area(self, center, radius):
@@ -170,10 +304,172 @@ class GameMap:
         return self.occupied_tiles.get(tile.location, False)
 
     def location_is_discovered(self, location):
-        return not self.fog_data.get(location, False)
+        (x, y) = location
+        if not (0 <= x < self.tile_width and 0 <= y < self.tile_height):
+            return False
+        return self.discovered_grid[y * self.tile_width + x] == 1
+
+    # Both locations in the same passable region, fog is not considered
+    def is_reachable(self, start, goal):
+        return self.components.connected(start, goal)
 
-    def get_path(self, start, goal, filter_function):
-        return alg.Astar(self.weighted_graph, goal, start, filter_function)
+    # Random location that can be walked to from start, None if start is enclosed
+    def get_random_reachable_location(self, start):
+        region = self.components.component_of(start)
+        return region[randint(0, len(region) - 1)] if region else None
+
+    def get_path(self, start, goal, filter_function, engine=None):
+        if not self.is_reachable(start, goal):
+            return False
+        # cache key (start, goal, fog-mode, engine)
+        key = (start, goal, filter_function is not None, engine or self.path_engine)
+        path = self.path_cache.get(key)
+        if path is None:
+            generation = self.path_cache.generation
+            path = self.search_path(start, goal, filter_function, key[3])
+            # a search that gave up is tried again next time
+            if path is not None:
+                self.path_cache.put(key, path, generation)
+        return self.walkable_path(path, key[2])
+
+    # hpa results are cached as waypoints, every request walks them with its own HierarchicalPath
+    def walkable_path(self, path, fog):
+        if isinstance(path, list):
+            return alg.HierarchicalPath(self.hierarchical_graphs[fog], path)
+        return path
+
+    def search_path(self, start, goal, filter_function, engine):
+        if engine == "hpa" and self.hierarchical_graphs:
+            return self.hierarchical_graphs[filter_function is not None].get_path(start, goal)
+        if engine == "jps":
+            if self.jump_point_boundary is None and isinstance(self.weighted_graph, alg.GridGraph):
+                self.jump_point_boundary = alg.BoundaryMask(self.weighted_graph, get_uniform_movement_cost())
+            return alg.JumpPointSearch(self.weighted_graph, goal, start, filter_function, get_uniform_movement_cost(), self.jump_point_boundary, self.search_stats, self.get_node_budget(filter_function))
+        return alg.Astar(self.weighted_graph, goal, start, filter_function, self.heuristic, self.search_stats, self.get_node_budget(filter_function))
+
+    # Searches only run between locations in the same region, so over the real terrain they always
+    # find their path. Through fog there may be no way over discovered tiles, those give up after
+    # node_budget expansions and return None, which is not cached
+    def get_node_budget(self, filter_function):
+        return self.node_budget if filter_function is not None else 0
+
+    def get_flow_field(self, goal, filter_function):
+        # one search serves every unit heading to the same goal
+        key = (goal, filter_function is not None)
+        field = self.flow_fields.get(key)
+        if field is None:
+            field = alg.FlowField(self.weighted_graph, goal, filter_function)
+            self.flow_fields[key] = field
+        return field
+
+    # Queue a path that is repaired as tiles are discovered, undiscovered tiles are assumed passable
+    # the first plan is made a slice per update like request_sliced_path, callback(*callback_args, path)
+    def request_incremental_path(self, start, goal, callback, callback_args=()):
+        if not self.is_reachable(start, goal):
+            self.path_service.submit_result(False, callback, callback_args)
+            return
+        planner = alg.DStarLite(self.weighted_graph, start, goal, self.location_is_discovered, get_min_movement_cost(), self.node_budget)
+        # tiles discovered while planning are repaired on the first step
+        self.incremental_planners.add(planner)
+        self.sliced_searches.append((planner, None, None, callback, callback_args))
+
+    # Closest reachable location out of goals, returns (goal, path)
+    def get_nearest_path(self, start, goals, filter_function):
+        # a set, the search checks every expanded node against it
+        goals = frozenset(goal for goal in goals if self.is_reachable(start, goal))
+        if not goals:
+            return (None, False)
+        return alg.DijkstraNearest(self.weighted_graph, start, goals, filter_function, self.get_node_budget(filter_function))
+
+    # Queue a path on the path service, callback(*callback_args, path) runs during update
+    def request_path(self, start, goal, filter_function, callback, callback_args=(), engine=None):
+        if not self.is_reachable(start, goal):
+            self.path_service.submit_result(False, callback, callback_args)
+            return
+        if self.path_backend == "sliced" and (engine or self.path_engine) == "astar":
+            self.request_sliced_path(start, goal, filter_function, callback, callback_args)
+            return
+        if not self.shared_grid:
+            self.path_service.submit(self.get_path, (start, goal, filter_function, engine), callback, callback_args)
+            return
+        if (engine or self.path_engine) == "hpa":
+            # hierarchical graphs live in this process, the abstract search is cheap enough to run here
+            self.path_service.submit_result(self.get_path(start, goal, filter_function, engine), callback, callback_args)
+            return
+        # worker processes only receive (start, goal, fog-mode, engine)
+        key = (start, goal, filter_function is not None, engine or self.path_engine)
+        path = self.path_cache.get(key)
+        if path is not None:
+            self.path_service.submit_result(self.walkable_path(path, key[2]), callback, callback_args)
+        else:
+            store_args = (key, self.path_cache.generation, callback, callback_args)
+            self.path_service.submit(path_process.get_path, key, self.__store_path, store_args)
+
+    # Queue a nearest-goal search on the path service, callback(*callback_args, (goal, path)) runs during update
+    def request_nearest_path(self, start, goals, filter_function, callback, callback_args=()):
+        goals = frozenset(goal for goal in goals if self.is_reachable(start, goal))
+        if not goals:
+            self.path_service.submit_result((None, False), callback, callback_args)
+        elif not self.shared_grid:
+            self.path_service.submit(self.get_nearest_path, (start, goals, filter_function), callback, callback_args)
+        else:
+            target_args = (start, goals, filter_function is not None)
+            self.path_service.submit(path_process.get_nearest_path, target_args, callback, callback_args)
+
+    # Astar run on the main loop, a few nodes per update instead of on a worker
+    def request_sliced_path(self, start, goal, filter_function, callback, callback_args=()):
+        key = (start, goal, filter_function is not None, "astar")
+        path = self.path_cache.get(key)
+        if path is not None:
+            self.path_service.submit_result(path, callback, callback_args)
+            return
+        search = alg.AstarSearch(self.weighted_graph, goal, start, filter_function, self.heuristic, self.search_stats, self.get_node_budget(filter_function))
+        self.sliced_searches.append((search, key, self.path_cache.generation, callback, callback_args))
+
+    def update_sliced_searches(self):
+        # the oldest search gets the slice first, finished ones hand over the rest
+        nodes = g_vars["Pathfinding"]["NodesPerTick"]
+        while self.sliced_searches and nodes > 0:
+            search, key, generation, callback, callback_args = self.sliced_searches[0]
+            expanded = search.expanded
+            if not search.step(nodes):
+                break
+            nodes -= max(search.expanded - expanded, 1)
+            self.sliced_searches.popleft()
+            # incremental plans are per unit and not cached
+            if key is None:
+                callback(*callback_args, search.result)
+            else:
+                self.__store_path(key, generation, callback, callback_args, search.result)
+
+    def __store_path(self, key, generation, callback, callback_args, path):
+        if path is not None:
+            self.path_cache.put(key, path, generation)
+        callback(*callback_args, self.walkable_path(path, key[2]))
+
+    def get_path_cache_stats(self):
+        hits, misses = self.path_cache.hits, self.path_cache.misses
+        minutes = time.clock.elapsed / 60
+        return {
+            "hits": hits,
+            "misses": misses,
+            "size": len(self.path_cache.elements),
+            "saved_per_minute": hits / minutes if minutes > 0 else 0,
+        }
+
+# Cheapest straight and diagonal steps over the passable tile types
+def get_min_movement_cost():
+    tile_types = [tile for name, tile in g_vars["Tile"].items() if name != "Basic" and tile["Passable"] == 1]
+    return (min(tile["MovementStraight"] for tile in tile_types), min(tile["MovementDiagonal"] for tile in tile_types))
+
+# Arguments for algorithms.MakeHeuristic
+def get_heuristic_config():
+    (straight, diagonal) = get_min_movement_cost()
+    return (g_vars["Pathfinding"]["Heuristic"], straight, diagonal, g_vars["Pathfinding"]["HeuristicWeight"])
+
+# Ground is the terrain jump point search can skip over
+def get_uniform_movement_cost():
+    return (g_vars["Tile"]["Ground"]["MovementStraight"], g_vars["Tile"]["Ground"]["MovementDiagonal"])
 
 class Camera:
     def __init__(self, width, height):
@@ -186,6 +482,11 @@ class Camera:
     def apply(self, entity):
         return entity.rect.move(self.camera.topleft)
 
+    # Tiles (x1, y1, x2, y2) shown on a screen of the given size
+    def get_visible_area(self, width, height):
+        tile_size = g_vars["Game"]["TileSize"]
+        return (self.x // tile_size, self.y // tile_size, (self.x + width - 1) // tile_size, (self.y + height - 1) // tile_size)
+
     def move(self, dx=0, dy=0):
         self.x += dx * int(g_vars["Game"]["TileSize"])
         self.y += dy * int(g_vars["Game"]["TileSize"])
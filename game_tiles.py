@@ -4,9 +4,29 @@ from pygame import Surface
 import game_assets as assets
 from game_settings import g_vars
 
+# tiles of one color share their image
+tile_images = {}
+
+def get_tile_image(tile_color):
+    image = tile_images.get(tile_color)
+    if image is None:
+        image = Surface((g_vars["Game"]["TileSize"], g_vars["Game"]["TileSize"]))
+        image.fill(g_vars["Game"]["TileColors"][tile_color])
+        tile_images[tile_color] = image
+    return image
+
+# Pathing values of a tile type without creating a tile
+def get_tile_pathing(name):
+    basic, tile = g_vars["Tile"]["Basic"], g_vars["Tile"][name]
+    return (tile["Passable"] == 1,
+        tile.get("MovementStraight", basic["MovementStraight"]),
+        tile.get("MovementDiagonal", basic["MovementDiagonal"]))
+
 class BasicTile(sprite.Sprite):
     def __init__(self, gamemap, location):
-        sprite.Sprite.__init__(self, self.groups) # Add self to group
+        sprite.Sprite.__init__(self)
+        if not gamemap.headless:
+            self.add(self.groups) # Add self to group
         # map
         self.gamemap = gamemap
         self.location = location
@@ -16,52 +36,56 @@ class BasicTile(sprite.Sprite):
         self.movement_diagonal = g_vars["Tile"]["Basic"]["MovementDiagonal"]
         # graphic
         #self.image = assets.LoadSprite("unicorn.jpg")
-        self.image = Surface((g_vars["Game"]["TileSize"], g_vars["Game"]["TileSize"]))
-        self.image.fill(g_vars["Game"]["TileColors"][self.tile_color])
-        self.rect = self.image.get_rect()
-        self.rect.x = location[0] * g_vars["Game"]["TileSize"]
-        self.rect.y = location[1] * g_vars["Game"]["TileSize"]
+        self.image = None
+        self.rect = None
+        if not gamemap.headless:
+            self.image = get_tile_image(self.tile_color)
+            self.rect = self.image.get_rect()
+            self.rect.x = location[0] * g_vars["Game"]["TileSize"]
+            self.rect.y = location[1] * g_vars["Game"]["TileSize"]
 
-        # Resource
-        self.resource_list = []         # remaining resources
-        self.available_resources = []   # not occupied resources 
+        # Resource, counted per resource class
+        self.resource_counts = {}   # remaining resources
+        self.free_counts = {}       # not occupied resources
+        self.gathered_types = {}
+        self.resource_total = 0
+        self.resource_sprites = {}  # only used for rendering, see get_resource_sprites
 
     def add_resource(self, resource, amount=1):
-        for x in range(amount):
-            x1, y1 = self.location[0], self.location[1]
-            new_resource = resource(self.gamemap, (x1, y1))
-            self.resource_list.append(new_resource)
-            self.available_resources.append(new_resource)
+        self.gathered_types[resource] = resource.gathered_type
+        self.resource_counts[resource] = self.resource_counts.get(resource, 0) + amount
+        self.free_counts[resource] = self.free_counts.get(resource, 0) + amount
+        self.resource_total += amount
+
+    # Sprites of the remaining resources, created the first time the tile is rendered
+    def get_resource_sprites(self):
+        for resource, count in self.resource_counts.items():
+            sprites = self.resource_sprites.setdefault(resource, [])
+            while len(sprites) < count:
+                sprites.append(resource(self.gamemap, self.location))
+        return self.resource_sprites
 
     def has_resources_remaining(self):
-        return len(self.resource_list) > 0
+        return self.resource_total > 0
 
     def has_free_resource_type(self, target):
-        for resource in self.available_resources:
-            if isinstance(resource, target):
-                return True
-        return False
+        return self.free_counts.get(target, 0) > 0
 
     # Occupy one of the available resource for gathering
     def occupy_resource(self, target):
-        for resource in self.available_resources:
-            if isinstance(resource, target):
-                self.available_resources.remove(resource)
-                return
+        if self.free_counts.get(target, 0) > 0:
+            self.free_counts[target] -= 1
 
     # Remove and separate a resource from the tile
     def deduct_resource(self, target):
-        for resource in self.resource_list:
-            if isinstance(resource, target):
-                self.resource_list.remove(resource)
-                return resource.gathered_type
-
-class Fog(BasicTile):
-    def __init__(self, gamemap, location):
-        self.groups = gamemap.sprite_group_fog
-        self.tile_color = "Fog"
-        BasicTile.__init__(self, gamemap, location)
-        #self.passable = g_vars["Tile"]["Fog"]["Passable"] == "1"
+        if self.resource_counts.get(target, 0) > 0:
+            self.resource_counts[target] -= 1
+            self.resource_total -= 1
+            sprites = self.resource_sprites.get(target)
+            if sprites and len(sprites) > self.resource_counts[target]:
+                sprites.pop()
+            self.gamemap.redraw_tiles([self.location])
+            return self.gathered_types[target]
 
 class Forest(BasicTile):
     def __init__(self, gamemap, location):
@@ -12,6 +12,36 @@ class Clock():
         self.delta = self.__clock.tick(fps) / 1000.0 * speed
         self.elapsed += self.delta
 
+    # Waits for the next frame, returns the real seconds since the last one
+    def tick(self, fps=1):
+        return self.__clock.tick(fps) / 1000.0
+
+    # Step by a fixed delta instead of the measured frame time
+    def advance(self, delta):
+        self.delta = delta
+        self.elapsed += delta
+
+# Fixed timestep, frame time fills an accumulator that is spent in steps of a constant delta,
+# a faster game runs more steps per frame instead of bigger ones
+class FixedStep():
+
+    def __init__(self, delta, max_steps=100):
+        self.delta = delta
+        self.max_steps = max_steps  # steps per frame, time beyond that is dropped
+        self.accumulator = 0.0
+        self.alpha = 0.0            # how far time is between the last step and the next, for drawing
+
+    # Number of steps to run for frame_time (simulated) seconds
+    def frame(self, frame_time):
+        self.accumulator += frame_time
+        steps = int(self.accumulator / self.delta)
+        if steps > self.max_steps:
+            steps = self.max_steps
+            self.accumulator = steps * self.delta
+        self.accumulator -= steps * self.delta
+        self.alpha = self.accumulator / self.delta
+        return steps
+
 def now():
     return time.time_ns() / 1000000
 
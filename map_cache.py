@@ -0,0 +1,77 @@
+import mmap
+import os
+import random
+import struct
+
+# Compiled map templates, stored next to the .txt and memory mapped on load
+# layout: header | terrain (one template char per tile) | ore tile indices (int32)
+MAGIC = b"LTUM"
+VERSION = 1
+HEADER = struct.Struct("<4sIIIqI")   # magic, version, width, height, template mtime, ore count
+
+class CompiledMap:
+    # raises ValueError for an empty file and struct.error for a cut off header
+    def __init__(self, file_name):
+        with open(file_name, "rb") as f:
+            self.memory = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (magic, version, self.width, self.height, self.mtime, self.ore_count) = HEADER.unpack_from(self.memory)
+        except struct.error:
+            self.memory.close()
+            raise
+        size = self.width * self.height
+        self.valid = magic == MAGIC and version == VERSION and len(self.memory) == HEADER.size + size + 4 * self.ore_count
+        self.views = []
+        if self.valid:
+            self.buffer = memoryview(self.memory)
+            self.terrain = self.buffer[HEADER.size:HEADER.size + size]
+            self.ore_tiles = self.buffer[HEADER.size + size:HEADER.size + size + 4 * self.ore_count].cast("i")
+            self.views = [self.ore_tiles, self.terrain, self.buffer]
+
+    def terrain_at(self, location):
+        return chr(self.terrain[location[1] * self.width + location[0]])
+
+    def close(self):
+        for view in self.views:
+            view.release()
+        self.memory.close()
+
+def get_cache_name(template_name):
+    return os.path.splitext(template_name)[0] + ".map"
+
+# ore_count tile indices picked at random among the passable ones in terrain,
+# a seed gives the same ores every time
+def place_ores(terrain, ore_count, passable_chars, seed=None):
+    randint = random.randint if seed is None else random.Random(seed).randint
+    passable_bytes = set(ord(char) for char in passable_chars)
+    passable = [i for i, char in enumerate(terrain) if char in passable_bytes]
+    return [passable[randint(0, len(passable) - 1)] for i in range(ore_count)] if passable else []
+
+# Parse the text template and write its compiled form, ores are placed on random passable tiles
+def compile_map(template_name, ore_count, passable_chars, seed=None):
+    with open(template_name, "rt") as f:
+        rows = [row.strip("\n") for row in f]
+    width, height = len(rows[0]), len(rows)
+    terrain = "".join(row.ljust(width, "M")[:width] for row in rows).encode("ascii")
+    ore_tiles = place_ores(terrain, ore_count, passable_chars, seed)
+
+    with open(get_cache_name(template_name), "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, width, height, os.stat(template_name).st_mtime_ns, len(ore_tiles)))
+        f.write(terrain)
+        f.write(struct.pack("<%di" % len(ore_tiles), *ore_tiles))
+
+# Compiled map for template_name, rebuilt when the template changed since it was cached
+# or the cache file is damaged
+def load_map(template_name, ore_count, passable_chars, seed=None):
+    cache_name = get_cache_name(template_name)
+    if os.path.exists(cache_name):
+        try:
+            compiled = CompiledMap(cache_name)
+        except (ValueError, struct.error):
+            compiled = None
+        if compiled:
+            if compiled.valid and compiled.mtime == os.stat(template_name).st_mtime_ns and compiled.ore_count == ore_count:
+                return compiled
+            compiled.close()
+    compile_map(template_name, ore_count, passable_chars, seed)
+    return CompiledMap(cache_name)
@@ -0,0 +1,99 @@
+import hashlib
+import random
+import sys
+from os import path
+
+import game_assets as assets
+from game_settings import g_vars
+
+# Seeded maps in the template format, same seed and settings give the same map
+# water is placed in the lowest and mountains on the highest ground, forest and bog where it is wettest
+
+# the settings are hashed into the name, so changed ratios or feature size give a new template
+def get_map_name(width, height, seed, ratios, feature_size):
+    settings = repr((sorted(ratios.items()), feature_size)).encode("ascii")
+    return "generated_%dx%d_%d_%s.txt" % (width, height, seed, hashlib.md5(settings).hexdigest()[:8])
+
+# Smooth noise in [0, 1), random values on a lattice of feature_size tiles blended over a few octaves
+def generate_noise(rng, width, height, feature_size, octaves=3):
+    noise = [[0.0] * width for y in range(height)]
+    weight, total = 1.0, 0.0
+    for octave in range(octaves):
+        size = max(feature_size >> octave, 1)
+        lattice_width, lattice_height = width // size + 2, height // size + 2
+        lattice = [[rng.random() for x in range(lattice_width)] for y in range(lattice_height)]
+        # lattice rows blended along x once, then rows are blended along y
+        columns = [(x // size, (x % size) / size) for x in range(width)]
+        blended = [[row[i] + (row[i + 1] - row[i]) * t for (i, t) in columns] for row in lattice]
+        for y in range(height):
+            row0, row1 = blended[y // size], blended[y // size + 1]
+            t = (y % size) / size
+            noise[y] = [n + (a + (b - a) * t) * weight for n, a, b in zip(noise[y], row0, row1)]
+        total += weight
+        weight *= 0.5
+    return [[n / total for n in row] for row in noise]
+
+# Value in values that ratio of them are below
+def get_threshold(values, ratio):
+    if ratio <= 0:
+        return -1.0
+    if ratio >= 1:
+        return 2.0
+    return values[int(len(values) * ratio)]
+
+def generate_map(width, height, seed, ratios, feature_size=16):
+    rng = random.Random(seed)
+    elevation = generate_noise(rng, width, height, feature_size)
+    moisture = generate_noise(rng, width, height, feature_size)
+    total = float(sum(ratios.values()))
+    share = dict((name, ratios.get(name, 0) / total) for name in ("Water", "Mountain", "Forest", "Bog"))
+
+    heights = sorted(value for row in elevation for value in row)
+    water_level = get_threshold(heights, share["Water"])
+    mountain_level = get_threshold(heights, 1 - share["Mountain"])
+    # forest and bog shares are of the land left between water and mountains
+    land = 1 - share["Water"] - share["Mountain"]
+    wetness = sorted(moisture[y][x] for y in range(height) for x in range(width) if water_level <= elevation[y][x] < mountain_level)
+    forest_level = get_threshold(wetness, 1 - share["Forest"] / land) if land > 0 and wetness else 2.0
+    bog_level = get_threshold(wetness, 1 - (share["Forest"] + share["Bog"]) / land) if land > 0 and wetness else 2.0
+
+    rows = []
+    for y in range(height):
+        row = []
+        for x in range(width):
+            e, m = elevation[y][x], moisture[y][x]
+            if e < water_level:
+                row.append("V")
+            elif e >= mountain_level:
+                row.append("B")
+            elif m >= forest_level:
+                row.append("T")
+            elif m >= bog_level:
+                row.append("G")
+            else:
+                row.append("M")
+        rows.append(row)
+
+    # keep the starting corner open
+    for y in range(min(height, 6)):
+        for x in range(min(width, 6)):
+            rows[y][x] = "M"
+    return ["".join(row) for row in rows]
+
+# Write a generated template to the map folder (once per name), returns the template name
+def generate_map_file(width, height, seed, ratios=None, feature_size=None):
+    settings = g_vars["MapGenerator"]
+    ratios, feature_size = ratios or settings["Ratios"], feature_size or settings["FeatureSize"]
+    name = get_map_name(width, height, seed, ratios, feature_size)
+    file_name = path.join(assets.map_folder, name)
+    if not path.exists(file_name):
+        rows = generate_map(width, height, seed, ratios, feature_size)
+        with open(file_name, "wt") as f:
+            f.write("\n".join(rows) + "\n")
+    return name
+
+# usage: python map_generator.py width height [seed], sizes up to 2000x2000 are supported
+if __name__ == "__main__":
+    width, height = int(sys.argv[1]), int(sys.argv[2])
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else g_vars["MapGenerator"]["Seed"]
+    print(generate_map_file(width, height, seed))
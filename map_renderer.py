@@ -0,0 +1,155 @@
+import pygame as pg
+
+import algorithms as alg
+from game_settings import g_vars
+
+# Terrain, resources and fog pre-rendered into chunk surfaces, a chunk is only
+# rendered again when one of its tiles changes. Between full redraws only the
+# areas under units, structures and overlays are restored and updated on the display.
+class MapRenderer:
+    def __init__(self, gamemap):
+        self.gamemap = gamemap
+        self.tile_size = g_vars["Game"]["TileSize"]
+        self.chunk_size = g_vars["Game"]["ChunkSize"]     # tiles per chunk side
+        self.chunks = alg.LRUCache(g_vars["Game"]["ChunkCache"])  # (fog, chunk x, chunk y) -> Surface
+        self.sprite_rects = []  # screen rects of sprites drawn last frame
+        self.overlay_rects = [] # screen rects drawn over the map last frame, e.g. UI panels
+        self.view = None        # camera offset and fog mode of the last frame
+        self.full_redraw = True
+
+    def chunk_of(self, location):
+        return (location[0] // self.chunk_size, location[1] // self.chunk_size)
+
+    def redraw_tiles(self, locations):
+        chunks = set(self.chunk_of(location) for location in locations)
+        self.chunks.remove_where(lambda key: key[1:] in chunks)
+
+    def redraw(self):
+        self.full_redraw = True
+
+    # Rects drawn over the map after draw, the map under them is put back next frame
+    def add_overlays(self, rects):
+        self.overlay_rects.extend(rects)
+
+    def render_chunk(self, fog, chunk):
+        gamemap, tile_size = self.gamemap, self.tile_size
+        colors = g_vars["Game"]["TileColors"]
+        (x1, y1) = (chunk[0] * self.chunk_size, chunk[1] * self.chunk_size)
+        x2, y2 = min(x1 + self.chunk_size, gamemap.tile_width), min(y1 + self.chunk_size, gamemap.tile_height)
+        origin = (x1 * tile_size, y1 * tile_size)
+        surface = pg.Surface(((x2 - x1) * tile_size, (y2 - y1) * tile_size))
+        for y in range(y1, y2):
+            for x in range(x1, x2):
+                area = ((x - x1) * tile_size, (y - y1) * tile_size, tile_size, tile_size)
+                if fog and not gamemap.discovered_grid[y * gamemap.tile_width + x]:
+                    surface.fill(colors["Fog"], area)
+                    continue
+                tile = gamemap.get_resource_tile((x, y))
+                surface.fill(colors[tile.tile_color if tile else gamemap.get_tile_type((x, y))], area)
+                if tile:
+                    for sprites in tile.get_resource_sprites().values():
+                        for resource in sprites:
+                            surface.blit(resource.image, resource.rect.move(-origin[0], -origin[1]))
+        return surface
+
+    def get_chunk(self, fog, chunk):
+        key = (fog,) + chunk
+        surface = self.chunks.get(key)
+        if surface is None:
+            surface = self.render_chunk(fog, chunk)
+            self.chunks.put(key, surface)
+            return surface, True
+        return surface, False
+
+    # Chunks overlapping a screen rect, as (chunk, screen position)
+    def visible_chunks(self, camera, view_rect):
+        chunk_pixels = self.chunk_size * self.tile_size
+        cx1, cy1 = max((view_rect.left + camera.x) // chunk_pixels, 0), max((view_rect.top + camera.y) // chunk_pixels, 0)
+        cx2 = min((view_rect.right - 1 + camera.x) // chunk_pixels, (self.gamemap.tile_width - 1) // self.chunk_size)
+        cy2 = min((view_rect.bottom - 1 + camera.y) // chunk_pixels, (self.gamemap.tile_height - 1) // self.chunk_size)
+        return [((cx, cy), (cx * chunk_pixels - camera.x, cy * chunk_pixels - camera.y))
+            for cy in range(cy1, cy2 + 1) for cx in range(cx1, cx2 + 1)]
+
+    # Draws the map, returns the changed screen rects or None when the whole screen changed
+    # alpha is how far time is past the last simulation step, see FixedStep
+    def draw(self, screen, sprites, alpha=1.0):
+        camera, fog = self.gamemap.camera, self.gamemap.draw_fog
+        screen_rect = screen.get_rect()
+        view = (camera.x, camera.y, fog)
+        full_redraw = self.full_redraw or view != self.view
+        self.view, self.full_redraw = view, False
+
+        dirty = []
+        if full_redraw:
+            screen.fill(g_vars["Game"]["Colors"]["LightGray"])
+            for chunk, position in self.visible_chunks(camera, screen_rect):
+                screen.blit(self.get_chunk(fog, chunk)[0], position)
+        else:
+            # chunks with changed tiles
+            for chunk, position in self.visible_chunks(camera, screen_rect):
+                surface, rendered = self.get_chunk(fog, chunk)
+                if rendered:
+                    dirty.append(screen.blit(surface, position))
+            # put the map back where sprites and overlays were, overlays may reach past the map
+            for rect in self.overlay_rects:
+                screen.fill(g_vars["Game"]["Colors"]["LightGray"], rect)
+            restored = self.sprite_rects + self.overlay_rects
+            for rect in restored:
+                for chunk, position in self.visible_chunks(camera, rect):
+                    surface = self.get_chunk(fog, chunk)[0]
+                    screen.blit(surface, rect, rect.move(-position[0], -position[1]))
+            dirty.extend(restored)
+        self.overlay_rects = []
+
+        interpolate = g_vars["Game"]["Interpolate"]
+        self.sprite_rects = []
+        for sprite in sprites:
+            if sprite.is_visible:
+                position = camera.apply(sprite)
+                if interpolate:
+                    # between the position before the last step and the current one
+                    (x, y) = sprite.previous_position
+                    position.move_ip(round((x - sprite.rect.x) * (1 - alpha)), round((y - sprite.rect.y) * (1 - alpha)))
+                rect = screen.blit(sprite.image, position)
+                if rect.width and rect.height:
+                    self.sprite_rects.append(rect)
+        if full_redraw:
+            return None
+        return dirty + self.sprite_rects
+
+# Sprites bucketed by the tile they stand on, so drawing only visits sprites in view
+class SpriteIndex:
+    def __init__(self, bucket_size=8):
+        self.bucket_size = bucket_size
+        self.buckets = {}   # (bucket x, bucket y) -> {sprite: None}, kept in insertion order
+        self.placed = {}    # sprite -> bucket
+
+    def move(self, sprite, location):
+        bucket = (location[0] // self.bucket_size, location[1] // self.bucket_size)
+        old_bucket = self.placed.get(sprite)
+        if old_bucket == bucket:
+            return
+        if old_bucket is not None:
+            self.remove(sprite)
+        self.buckets.setdefault(bucket, {})[sprite] = None
+        self.placed[sprite] = bucket
+
+    def remove(self, sprite):
+        bucket = self.placed.pop(sprite, None)
+        if bucket is not None:
+            sprites = self.buckets[bucket]
+            del sprites[sprite]
+            if not sprites:
+                del self.buckets[bucket]
+
+    # Sprites standing on tiles x1..x2, y1..y2
+    def query(self, area):
+        (x1, y1, x2, y2) = area
+        size = self.bucket_size
+        found = []
+        for by in range(y1 // size, y2 // size + 1):
+            for bx in range(x1 // size, x2 // size + 1):
+                sprites = self.buckets.get((bx, by))
+                if sprites:
+                    found.extend(sprites)
+        return found
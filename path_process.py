@@ -0,0 +1,73 @@
+from multiprocessing import shared_memory
+
+import algorithms as alg
+
+# Passability, costs and discovered tiles shared between the game and path worker processes,
+# successors and the jump point boundary are kept up to date by the game
+# layout: passable | discovered | successors | boundary | straight costs | diagonal costs
+class SharedGrid:
+    def __init__(self, width, height, name=None):
+        self.width = width
+        self.height = height
+        size = width * height
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=12 * size)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.name = self.memory.name
+        # keep every view so they can be released before the memory is closed
+        self.views = [
+            self.memory.buf[4 * size:8 * size],
+            self.memory.buf[8 * size:12 * size],
+        ]
+        self.passable_grid = self.memory.buf[0:size]
+        self.discovered_grid = self.memory.buf[size:2 * size]
+        self.successor_grid = self.memory.buf[2 * size:3 * size]
+        self.boundary_grid = self.memory.buf[3 * size:4 * size]
+        self.straight_grid = self.views[0].cast("i")
+        self.diagonal_grid = self.views[1].cast("i")
+        self.views = [self.straight_grid, self.diagonal_grid] + self.views + [self.passable_grid, self.discovered_grid, self.successor_grid, self.boundary_grid]
+
+    def create_graph(self):
+        return alg.GridGraph(self.width, self.height, self.passable_grid, self.straight_grid, self.diagonal_grid, self.successor_grid)
+
+    def is_discovered(self, location):
+        return self.discovered_grid[location[1] * self.width + location[0]] == 1
+
+    def close(self, unlink=False):
+        for view in self.views:
+            view.release()
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+
+#----------------------------WORKER PROCESS--------------------------------------#
+worker_grid = None
+worker_graph = None
+worker_uniform_cost = None
+worker_boundary = None
+worker_heuristic = None
+worker_node_budget = None  # for searches through fog, see GameMap.get_node_budget
+
+def init_worker(name, width, height, uniform_cost, heuristic_config, node_budget=None):
+    global worker_grid, worker_graph, worker_uniform_cost, worker_boundary, worker_heuristic, worker_node_budget
+    worker_grid = SharedGrid(width, height, name)
+    worker_graph = worker_grid.create_graph()
+    worker_boundary = worker_grid.boundary_grid
+    worker_uniform_cost = uniform_cost
+    worker_heuristic = alg.MakeHeuristic(*heuristic_config)
+    worker_node_budget = node_budget
+
+# hierarchical data is kept by the game, which runs hpa requests itself
+def get_path(start, goal, fog, engine):
+    if engine not in ("astar", "jps"):
+        raise ValueError("path workers don't run engine " + repr(engine))
+    filter_function = worker_grid.is_discovered if fog else None
+    node_budget = worker_node_budget if fog else 0
+    if engine == "jps":
+        return alg.JumpPointSearch(worker_graph, goal, start, filter_function, worker_uniform_cost, worker_boundary, None, node_budget)
+    return alg.Astar(worker_graph, goal, start, filter_function, worker_heuristic, None, node_budget)
+
+def get_nearest_path(start, goals, fog):
+    filter_function = worker_grid.is_discovered if fog else None
+    return alg.DijkstraNearest(worker_graph, start, goals, filter_function, worker_node_budget if fog else 0)
@@ -1,3 +1,4 @@
+import itertools
 from random import randint
 
 import ai_state
@@ -9,6 +10,83 @@ import state_machine as fsm
 from game_settings import g_vars
 
 
+class EntityRegistry:
+    # Entities indexed by concrete class, with the idle ones and the ones in each state kept apart
+    # an entity can be added more than once, counts include every time it was added
+    def __init__(self):
+        self.entities = {}  # class -> {entity: times added}, in the order they were added
+        self.counts = {}    # class -> entities added, duplicates included
+        self.idle = {}      # class -> {idle entity: None}, longest idle first
+        self.states = {}    # (class, state class) -> {entity: None}
+        self.state_of = {}  # entity -> state class it is filed under
+
+    def __contains__(self, entity):
+        return entity in self.state_of
+
+    def add(self, entity):
+        entity_class = type(entity)
+        self.counts[entity_class] = self.counts.get(entity_class, 0) + 1
+        entities = self.entities.setdefault(entity_class, {})
+        if entity in entities:
+            entities[entity] += 1
+            return
+        entities[entity] = 1
+        state = type(entity.fsm.currentState)
+        self.states.setdefault((entity_class, state), {})[entity] = None
+        self.state_of[entity] = state
+        if entity.is_idle:
+            self.idle.setdefault(entity_class, {})[entity] = None
+
+    def remove(self, entity):
+        entity_class = type(entity)
+        entities = self.entities[entity_class]
+        entities[entity] -= 1
+        self.counts[entity_class] -= 1
+        if entities[entity]:
+            return
+        del entities[entity]
+        del self.states[(entity_class, self.state_of.pop(entity))][entity]
+        self.idle.get(entity_class, {}).pop(entity, None)
+
+    # Refile an entity after its idle flag or state changed
+    def update(self, entity):
+        if entity not in self.state_of:
+            return
+        entity_class = type(entity)
+        idle = self.idle.setdefault(entity_class, {})
+        if not entity.is_idle:
+            idle.pop(entity, None)
+        elif entity not in idle:
+            idle[entity] = None
+        state = type(entity.fsm.currentState)
+        if state is not self.state_of[entity]:
+            del self.states[(entity_class, self.state_of[entity])][entity]
+            self.states.setdefault((entity_class, state), {})[entity] = None
+            self.state_of[entity] = state
+
+    # Entity groups of target class (subclasses included), either all, the idle ones or the ones in state
+    def groups(self, target, idle=False, state=None):
+        if state:
+            return [entities for (entity_class, entity_state), entities in self.states.items()
+                if issubclass(entity_class, target) and issubclass(entity_state, state)]
+        groups = self.idle if idle else self.entities
+        return [entities for entity_class, entities in groups.items() if issubclass(entity_class, target)]
+
+    def count(self, target, idle=False, state=None):
+        if idle or state:
+            return sum(len(entities) for entities in self.groups(target, idle, state))
+        return sum(count for entity_class, count in self.counts.items() if issubclass(entity_class, target))
+
+    # Up to count entities (all when count is None), each entity once
+    def get(self, target, count=None, idle=False, state=None):
+        found = []
+        for entities in self.groups(target, idle, state):
+            if count is None:
+                found.extend(entities)
+            else:
+                found.extend(itertools.islice(entities, max(count - len(found), 0)))
+        return found
+
 class AI:
     def __init__(self, gamemap, start_position):
         self.gamemap = gamemap
@@ -17,9 +95,11 @@ class AI:
         self.fsm.globalState = ai_state.AIGlobalState()
         self.fsm.currentState = ai_state.AIStateIdle()
         self.dispatcher = dispatch.MessageDispatcher()
-        self.entity_list = []
-        self.production_list = []
-        self.resource_map = {}
+        self.entities = EntityRegistry()     # owned entities
+        self.production = EntityRegistry()   # entities under production
+        self.resource_map = {}      # location -> discovered tile with resources
+        self.resource_index = {}    # resource class -> SpatialIndex of locations with a free resource
+        self.resource_counts = {}   # resource class -> remaining resources on discovered tiles
         self.current_goal = []
         self.current_task = None
         self.target_resource = None
@@ -159,7 +239,7 @@ class AI:
                 continue
             # deduct already owned resources (if any)
             else:
-                amount -= len(self.entities_where(lambda e: isinstance(e, target_class)))
+                amount -= self.count_entities(target_class)
             # chain multiplikation
             if not target_group == "Structure":
                 target_amount *= amount
@@ -179,37 +259,40 @@ class AI:
             target_amount = target[2]                    # resource needed
             if target[0] == "Exploration":
                     return False
-            elif not len(self.entities_where(lambda e: isinstance(e, target_class) and e.is_idle)) >= 1:
+            elif not self.count_entities(target_class, idle=True) >= 1:
                 return False
 
         return True
 
-    def entities_where(self, function):
-        return [e for e in self.entity_list if function(e)]
+    # Up to count owned entities of target class (subclasses included), only idle ones or ones in state if given
+    def get_entities(self, target, count=None, idle=False, state=None):
+        return self.entities.get(target, count, idle, state)
 
-    def entities_count_where(self, function, count=1):
-        entity_list = [e for e in self.entity_list if function(e)]
-        return entity_list[:count]
+    # Number of owned entities of target class (subclasses included), only idle ones or ones in state if given
+    def count_entities(self, target, idle=False, state=None):
+        return self.entities.count(target, idle, state)
 
     def add_entity(self, entity):
-        self.entity_list.append(entity)
+        self.entities.add(entity)
 
     def remove_entity(self, target):
-        self.entity_list.remove(target)
+        self.entities.remove(target)
         target.delete()
 
+    def add_production(self, entity):
+        self.production.add(entity)
+
+    def remove_production(self, entity):
+        self.production.remove(entity)
+
+    # Called by entities when their idle flag or state changed
+    def entity_changed(self, entity):
+        self.entities.update(entity)
+        self.production.update(entity)
+
     def has_num_entities(self, target, count=1):
-        # check own entities
-        for entity in self.entity_list:
-            if isinstance(entity, target):
-                count -= 1
-        # check what is currently udner production
-        for entity in self.production_list:
-            if isinstance(entity, target):
-                count -= 1
-        if count <= 0:
-            return True
-        return False
+        # own entities and what is currently under production
+        return self.entities.count(target) + self.production.count(target) >= count
 
     def get_buildable_tile(self):
         radius = 4
@@ -233,36 +316,50 @@ class AI:
             self.add_entity(new_resource)
 
     def has_resource(self, target, count=1):
-        target_class = entities.to_class(target)
-        for resource in self.entity_list:
-            if isinstance(resource, target_class):
-                count -= 1
-            if count <= 0:
-                return True
-        return False
+        return self.count_entities(entities.to_class(target)) >= count
+
+    def discover_resources(self, resource_tiles):
+        for location, resource_tile in resource_tiles.items():
+            if location in self.resource_map:
+                continue
+            self.resource_map[location] = resource_tile
+            for resource_class, count in resource_tile.resource_counts.items():
+                self.resource_counts[resource_class] = self.resource_counts.get(resource_class, 0) + count
+                if resource_tile.has_free_resource_type(resource_class):
+                    self.resource_index.setdefault(resource_class, algorithms.SpatialIndex()).add(location)
+
+    def resource_classes(self, target):
+        return [resource_class for resource_class in self.resource_counts if issubclass(resource_class, target)]
 
     def has_found_resource(self, target, count=1):
-        for resource_tile in self.resource_map.values():
-            for resource in resource_tile.resource_list:
-                if isinstance(resource, target):
-                    count -= 1
-                if count <= 0:
-                    return True
-        return False
-
-    def get_resource_location(self, worker_location, target):
-        # find matching resources
-        matches = []
-        for location, resource_tile in self.resource_map.items():
-            for resource in resource_tile.available_resources:
-                if isinstance(resource, target):
-                    matches.append(location)
-        # no matches
-        if not matches:
-            return None
-        # sort matches by Manhattan from worker location
-        sorted_matches = sorted(matches, key=lambda cord: (abs(cord[0] - worker_location[0]) + abs(cord[1] - worker_location[1])))
-        return sorted_matches[0]
+        return sum(self.resource_counts[resource_class] for resource_class in self.resource_classes(target)) >= count
+
+    # Up to count locations with a free resource of target class that can be walked to from origin, closest first
+    def get_nearest_resource_locations(self, target, origin, count=1):
+        found = []
+        reachable = lambda location: self.gamemap.is_reachable(origin, location)
+        for resource_class in self.resource_classes(target):
+            index = self.resource_index.get(resource_class)
+            if index:
+                valid = lambda location: self.resource_map[location].has_free_resource_type(resource_class)
+                found.extend(index.nearest(origin, count, valid, reachable))
+        if len(found) > count:
+            (x, y) = origin
+            found.sort(key=lambda location: (location[0] - x) ** 2 + (location[1] - y) ** 2)
+        return found[:count]
+
+    # Occupy a resource on a discovered tile and keep the index in sync
+    def occupy_tile_resource(self, tile, target):
+        tile.occupy_resource(target)
+        if not tile.has_free_resource_type(target) and target in self.resource_index:
+            self.resource_index[target].remove(tile.location)
+
+    # Remove a resource from a discovered tile, returns the gathered type
+    def deduct_tile_resource(self, tile, target):
+        gathered_type = tile.deduct_resource(target)
+        if gathered_type and target in self.resource_counts:
+            self.resource_counts[target] -= 1
+        return gathered_type
 
     def deduct_resource_cost(self, resource_list):
         for resource_cost in resource_list:
@@ -273,5 +370,5 @@ class AI:
             if not target_group == "Resource":
                 continue
             # find correct resource and deduct
-            for resource in self.entities_count_where(lambda res: isinstance(res, target_class), target_amount):
+            for resource in self.get_entities(target_class, target_amount):
                 self.remove_entity(resource)
\ No newline at end of file
@@ -5,6 +5,7 @@ class StateMachine:
         self.currentState = None
         self.previousState = None
         self.globalState = None
+        self.on_change = None   # called with owner after currentState changed
 
     def update(self):
         if(self.globalState):
@@ -20,6 +21,7 @@ class StateMachine:
             self.currentState.exit(self.owner)
             self.currentState = newState
             self.currentState.enter(self.owner)
+            self.changed()
 
     def enter_state_blip(self, stateBlip):
         if(self.currentState and stateBlip):
@@ -27,12 +29,18 @@ class StateMachine:
             self.previousState = self.currentState
             self.currentState = stateBlip
             self.currentState.enter(self.owner)
+            self.changed()
 
     def revert_to_prior_state(self):
         if(self.currentState and self.previousState):
             #log(str(type(self.owner)) + " reverting from " + str(type(self.currentState)) + " to " + str(type(self.previousState)))
             self.currentState.exit(self.owner)
             self.currentState = self.previousState
+            self.changed()
+
+    def changed(self):
+        if self.on_change:
+            self.on_change(self.owner)
 
     def is_in_state(self, state):
         return isinstance(self.currentState, state)